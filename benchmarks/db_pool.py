@@ -0,0 +1,78 @@
+"""Benchmark the pooled Database against opening a connection per call.
+
+Each operation pair saves and reads back a user preference, which the
+Database writes straight through rather than buffering, so the numbers
+compare connection handling only.
+
+    python -m benchmarks.db_pool [--ops 2000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import aiosqlite  # noqa: E402
+from database import Database  # noqa: E402
+
+
+async def connect_per_call(path: str, pairs: int) -> float:
+    """Ops/sec with a new connection for every call, as before the pool."""
+    async def save(user_id: int):
+        async with aiosqlite.connect(path) as db:
+            await db.execute('''
+                INSERT OR REPLACE INTO user_preferences
+                (user_id, preference_type, preference_value)
+                VALUES (?, ?, ?)
+            ''', (user_id, 'language', 'English'))
+            await db.commit()
+
+    async def get(user_id: int):
+        async with aiosqlite.connect(path) as db:
+            cursor = await db.execute('''
+                SELECT preference_value FROM user_preferences
+                WHERE user_id = ? AND preference_type = ?
+            ''', (user_id, 'language'))
+            await cursor.fetchone()
+
+    start = time.perf_counter()
+    for i in range(pairs):
+        await save(i % 100)
+        await get(i % 100)
+    return 2 * pairs / (time.perf_counter() - start)
+
+
+async def pooled(path: str, pairs: int) -> float:
+    """Ops/sec through the Database connection pool."""
+    db = Database(path)
+    await db.initialize()
+    try:
+        start = time.perf_counter()
+        for i in range(pairs):
+            await db.save_user_preference(i % 100, 'language', 'English')
+            await db.get_user_preference(i % 100, 'language')
+        return 2 * pairs / (time.perf_counter() - start)
+    finally:
+        await db.close()
+
+
+async def main(pairs: int):
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, 'legacy.db')
+        pooled_path = os.path.join(directory, 'pooled.db')
+
+        # Same schema for both, the legacy run then uses a default connection
+        db = Database(legacy_path)
+        await db.initialize()
+        await db.close()
+
+        print(f"connect-per-call: {await connect_per_call(legacy_path, pairs):8.0f} ops/s")
+        print(f"pooled:           {await pooled(pooled_path, pairs):8.0f} ops/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000, help='save/get pairs per run')
+    asyncio.run(main(parser.parse_args().ops))
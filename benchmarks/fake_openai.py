@@ -0,0 +1,82 @@
+"""Local fake of the OpenAI chat completions endpoint.
+
+Answers every request with the same reply, produced one token every
+--delay seconds. Streamed requests get each token as its own SSE chunk,
+others get the whole reply once all tokens are "generated". Point the bot
+or a benchmark at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.fake_openai [--port 8765] [--tokens 27] [--delay 0.05]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Hello there, this is a fairly long answer that arrives one token at a time."
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Serves /v1/chat/completions with a fixed per-token delay."""
+    daemon_threads = True
+
+    def __init__(self, address, tokens: int, delay: float):
+        super().__init__(address, _Handler)
+        words = REPLY.split()
+        self.tokens = [words[i % len(words)] + ' ' for i in range(tokens)]
+        self.delay = delay
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _chunk(self, token: str) -> bytes:
+        chunk = {'id': 'fake', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'fake',
+                 'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        tokens, delay = self.server.tokens, self.server.delay
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for token in tokens:
+                time.sleep(delay)
+                self.wfile.write(self._chunk(token))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        time.sleep(delay * len(tokens))
+        response = json.dumps({
+            'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': 'fake',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': ''.join(tokens).strip()}}],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': len(tokens),
+                      'total_tokens': 10 + len(tokens)}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tokens', type=int, default=27)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds per token')
+    args = parser.parse_args()
+    server = FakeOpenAIServer(('127.0.0.1', args.port), args.tokens, args.delay)
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,119 @@
+"""Seeded benchmark of the quiz leaderboard queries.
+
+Seeds a database with per-topic quiz stats for many users, lets
+Database.initialize() backfill the overall rows and rank counts, then
+times top-N and my-rank queries against a COUNT over the ranking index.
+Ranks are checked against a brute-force count before and after a batch
+of incremental answers.
+
+    python -m benchmarks.leaderboard [--users 300000] [--topics 3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from config import QUIZ_TOPICS  # noqa: E402
+from database import Database  # noqa: E402
+
+QUERIES = 1000
+
+
+def seed(path: str, users: int, topics_per_user: int) -> int:
+    """Insert per-topic stats rows and return the number of answers they count."""
+    topics = list(QUIZ_TOPICS)
+    answers = 0
+    rows = []
+    with sqlite3.connect(path) as db:
+        for user_id in range(1, users + 1):
+            for topic in random.sample(topics, topics_per_user):
+                total = random.randint(1, 60)
+                rows.append((user_id, topic, random.randint(0, total), total))
+                answers += total
+            if len(rows) >= 100000:
+                db.executemany('INSERT INTO quiz_stats VALUES (?, ?, ?, ?)', rows)
+                rows = []
+        db.executemany('INSERT INTO quiz_stats VALUES (?, ?, ?, ?)', rows)
+    return answers
+
+
+def brute_force_rank(path: str, user_id: int, topic: str) -> int:
+    with sqlite3.connect(path) as db:
+        return db.execute('''
+            SELECT COUNT(*) + 1 FROM quiz_stats
+            WHERE topic = ? AND correct > (
+                SELECT correct FROM quiz_stats WHERE user_id = ? AND topic = ?
+            )
+        ''', (topic, user_id, topic)).fetchone()[0]
+
+
+async def per_call(coroutine_factory) -> float:
+    """Milliseconds per call, averaged over QUERIES calls."""
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        await coroutine_factory(i)
+    return (time.perf_counter() - start) * 1000 / QUERIES
+
+
+async def check_ranks(db: Database, path: str, users, topics) -> None:
+    for user_id in users:
+        for topic in topics:
+            rank = await db.get_quiz_rank(user_id, topic)
+            if rank and rank['rank'] != brute_force_rank(path, user_id, topic or '*'):
+                raise AssertionError(f"Rank of user {user_id} in {topic} is wrong: {rank}")
+
+
+async def main(users: int, topics_per_user: int):
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'leaderboard.db')
+        db = Database(path)
+        await db.initialize()
+        await db.close()
+
+        answers = seed(path, users, topics_per_user)
+        print(f"seeded {users} users, {users * topics_per_user} stats rows, {answers} answers")
+
+        db = Database(path)
+        start = time.perf_counter()
+        await db.initialize()
+        print(f"initialize with ranking backfill: {time.perf_counter() - start:.2f}s")
+
+        sample = random.sample(range(1, users + 1), QUERIES)
+        for topic in (None, 'history'):
+            name = topic or 'overall'
+            top = await per_call(lambda i: db.get_quiz_leaderboard(topic, 10))
+            rank = await per_call(lambda i: db.get_quiz_rank(sample[i], topic))
+            async with db._connection() as connection:
+                async def count(i):
+                    cursor = await connection.execute('''
+                        SELECT COUNT(*) FROM quiz_stats WHERE topic = ? AND correct > ?
+                    ''', (topic or '*', random.randint(0, 60)))
+                    await cursor.fetchone()
+                counted = await per_call(count)
+            print(f"{name:<8} top-10 {top:.3f}ms  my-rank {rank:.3f}ms  "
+                  f"COUNT over index {counted:.3f}ms")
+
+        checked = random.sample(range(1, users + 1), 20)
+        await check_ranks(db, path, checked, (None, 'history'))
+
+        session_id = await db.start_quiz_session(checked[0], 'history', 'Benchmark')
+        for _ in range(50):
+            await db.record_quiz_answer(session_id, checked[0], 'history', random.random() < 0.8)
+        await db.flush()
+        await check_ranks(db, path, checked, (None, 'history'))
+        print("ranks match a brute-force count before and after 50 incremental answers")
+        await db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=300000)
+    parser.add_argument('--topics', type=int, default=3, help='topics played per user')
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.topics))
@@ -0,0 +1,97 @@
+"""Benchmark SQLitePersistence flushes with many users.
+
+Every user holds a quiz in progress. Each scenario times what one
+periodic persistence update costs: handing the touched users to the
+persistence and flushing the database buffer. A pickle dump of the same
+data, which PicklePersistence would write on every flush, is shown for
+comparison.
+
+    python -m benchmarks.persistence_flush [--users 100000]
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import random
+import tempfile
+import time
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from database import Database  # noqa: E402
+from utils.persistence import SQLitePersistence  # noqa: E402
+
+QUIZ = 'quiz'
+
+
+def quiz_user_data(user_id: int) -> dict:
+    """user_data of a user in the middle of a quiz."""
+    return {
+        'quiz_topic': random.choice(['history', 'science', 'geography', 'art']),
+        'quiz_mode': 'free',
+        'quiz_session_id': user_id,
+        'quiz_score': {'correct': random.randint(0, 20), 'total': 20},
+        'current_question': f"Question {user_id}: what is the capital of Country {user_id}?",
+        'correct_answer': f"City {user_id}",
+        'asked_question_ids': random.sample(range(10000), 10),
+    }
+
+
+async def timed(label: str, persistence: SQLitePersistence, users: dict, touched, states=()):
+    """Time one persistence update of the touched users and conversation states.
+
+    Handing over the data serialises and checksums it, the flush writes
+    the changed documents.
+    """
+    start = time.perf_counter()
+    for user_id in touched:
+        await persistence.update_user_data(user_id, users[user_id])
+    for user_id, state in states:
+        await persistence.update_conversation(QUIZ, (user_id, user_id), state)
+    handed_over = time.perf_counter()
+    await persistence.db.flush()
+    flushed = time.perf_counter()
+    print(f"{label:<45} update {handed_over - start:6.3f}s  flush {flushed - handed_over:6.3f}s")
+
+
+async def main(count: int):
+    random.seed(1)
+    users = {user_id: quiz_user_data(user_id) for user_id in range(1, count + 1)}
+    changed = random.sample(sorted(users), count // 100)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'persistence.db')
+        db = Database(path)
+        persistence = SQLitePersistence(db)
+        await persistence.get_user_data()
+
+        await timed(f"first save of {count} users", persistence, users, users)
+
+        for user_id in changed:
+            users[user_id]['quiz_score']['total'] += 1
+        await timed(f"{count} touched, {len(changed)} changed", persistence, users, users)
+
+        for user_id in changed:
+            users[user_id]['quiz_score']['total'] += 1
+        touched = changed + random.sample(sorted(users), len(changed))
+        states = [(user_id, random.randint(0, 3)) for user_id in touched]
+        await timed(f"{len(touched)} touched, {len(changed)} changed, {len(states)} states",
+                    persistence, users, touched, states)
+        await db.close()
+
+        db = Database(path)
+        start = time.perf_counter()
+        loaded = await SQLitePersistence(db).get_user_data()
+        print(f"{'cold load of %d users' % len(loaded):<45} {time.perf_counter() - start:6.3f}s")
+        await db.close()
+
+        start = time.perf_counter()
+        with open(os.path.join(directory, 'persistence.pickle'), 'wb') as file:
+            pickle.dump({'user_data': users}, file)
+        print(f"{'pickle dump of all users':<45} {time.perf_counter() - start:6.3f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    asyncio.run(main(parser.parse_args().users))
@@ -0,0 +1,76 @@
+"""Measure time to first visible token of streamed replies.
+
+Starts the fake OpenAI server from benchmarks.fake_openai on a free port
+and renders /gpt replies through stream_reply into a stand-in Telegram
+message. The time until the placeholder first shows reply text is
+compared with waiting for a whole non-streamed reply, which is what users
+saw before streaming.
+
+    python -m benchmarks.stream_ttft [--tokens 27] [--delay 0.05] [--runs 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+_server = None
+
+
+def start_server(tokens: int, delay: float):
+    """Start the fake server and point the client at it, before config is imported."""
+    global _server
+    _server = FakeOpenAIServer(('127.0.0.1', 0), tokens, delay)
+    os.environ['OPENAI_BASE_URL'] = _server.start()
+    os.environ.setdefault('OPENAI_API_KEY', 'fake')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+class StandInMessage:
+    """Records when text other than the placeholder first becomes visible."""
+
+    def __init__(self, placeholder: str):
+        self.placeholder = placeholder
+        self.first_visible = None
+
+    async def reply_text(self, text, **kwargs):
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        if self.first_visible is None and text != self.placeholder:
+            self.first_visible = time.monotonic()
+
+
+async def main(runs: int):
+    from openai_client import OpenAIClient
+    from utils.streaming import stream_reply
+
+    client = OpenAIClient()
+    streamed, whole = [], []
+    for i in range(runs):
+        # Distinct prompts so nothing is coalesced or cached
+        message = StandInMessage("💭 ...")
+        started = time.monotonic()
+        await stream_reply(message, client.stream_response(f"Question {i}", feature='gpt'),
+                           placeholder="💭 ...")
+        streamed.append(message.first_visible - started)
+
+        started = time.monotonic()
+        await client.generate_response(f"Question {i}", feature='gpt')
+        whole.append(time.monotonic() - started)
+
+    print(f"{len(_server.tokens)} tokens, {_server.delay * 1000:.0f}ms each, {runs} runs")
+    print(f"streamed, first visible token: {statistics.median(streamed) * 1000:7.0f}ms median")
+    print(f"non-streamed, whole reply:     {statistics.median(whole) * 1000:7.0f}ms median")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=27)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds per token')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    start_server(args.tokens, args.delay)
+    asyncio.run(main(args.runs))
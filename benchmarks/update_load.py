@@ -0,0 +1,71 @@
+"""Load test of concurrent per-chat ordered update processing.
+
+Many chats send a few messages at once, and each update is handled by a
+stand-in handler that waits as long as an OpenAI call might. Throughput
+is reported per concurrency limit, and the run fails if any chat's
+updates were handled out of order. A limit of 1 is the sequential
+processing used when CONCURRENT_UPDATES is not set.
+
+    python -m benchmarks.update_load [--chats 200] [--updates 3] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from telegram import Chat, Message, Update  # noqa: E402
+from utils.update_processor import ChatOrderedUpdateProcessor  # noqa: E402
+
+
+def make_updates(chats: int, per_chat: int):
+    """Interleaved text updates, the nth message of every chat, then the next."""
+    updates = []
+    now = datetime.now(timezone.utc)
+    for n in range(per_chat):
+        for chat_id in range(1, chats + 1):
+            message = Message(message_id=n, date=now, text=str(n),
+                              chat=Chat(id=chat_id, type=Chat.PRIVATE))
+            updates.append(Update(update_id=len(updates), message=message))
+    return updates
+
+
+async def run(limit: int, updates, latency: float) -> float:
+    """Process all updates and return updates/sec."""
+    processor = ChatOrderedUpdateProcessor(limit)
+    handled = defaultdict(list)
+
+    async def handler(update: Update):
+        await asyncio.sleep(latency)
+        handled[update.effective_chat.id].append(update.message.message_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(processor.process_update(update, handler(update))
+                           for update in updates))
+    elapsed = time.perf_counter() - start
+
+    for chat_id, message_ids in handled.items():
+        if message_ids != sorted(message_ids):
+            raise AssertionError(f"Chat {chat_id} handled out of order: {message_ids}")
+    return len(updates) / elapsed
+
+
+async def main(chats: int, per_chat: int, latency: float, limits):
+    updates = make_updates(chats, per_chat)
+    print(f"{chats} chats x {per_chat} updates, handler latency {latency * 1000:.0f}ms")
+    for limit in limits:
+        rate = await run(limit, updates, latency)
+        print(f"  limit={limit:<4} {rate:8.0f} updates/s, per-chat order preserved")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=3, help='updates per chat')
+    parser.add_argument('--latency', type=float, default=0.05, help='handler time in seconds')
+    parser.add_argument('--limits', type=int, nargs='+', default=[1, 32, 256])
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.updates, args.latency, args.limits))
@@ -9,8 +9,38 @@ load_dotenv()
 # Bot configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')
+
+# Serving mode: 'polling' or 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+
+# Number of updates processed at once (updates of one chat stay in order)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 1))
+
+# Per-user handler locks
+USER_LOCK_SHARDS = 16
+USER_LOCK_IDLE_TIMEOUT = 300
+
 DATABASE_PATH = os.getenv('DATABASE_PATH')
 
+# Database connection pool
+DB_POOL_SIZE = 4
+DB_CACHE_SIZE_KB = 8192
+DB_CACHED_STATEMENTS = 256
+DB_BUSY_TIMEOUT = 5.0
+
+# Write-behind batching of frequent database writes
+DB_FLUSH_INTERVAL_MS = 200
+DB_FLUSH_MAX_ROWS = 100
+
+# Seconds between saves of changed user data and conversation states
+PERSISTENCE_UPDATE_INTERVAL = 10
+
 # Logging configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', logging.INFO)
 logging.basicConfig(
@@ -23,6 +53,67 @@ OPENAI_MODEL = "gpt-4.1"
 MAX_TOKENS = 1000
 TEMPERATURE = 0.7
 
+# OpenAI account rate limits, requests and tokens per minute
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', 500))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', 30000))
+
+# Seconds each feature may spend on a request, rate limiting and retries included.
+# Streams must have started by their deadline.
+OPENAI_DEADLINES = {
+    'gpt': 30,
+    'talk': 30,
+    'translate': 20,
+    'quiz': 30,
+    'quiz_check': 15,
+    'recommend': 45,
+    'recommend_pool': 120,
+    'fact': 30,
+    'summary': 60
+}
+OPENAI_DEFAULT_DEADLINE = 60
+
+# Retries of transient failures (timeouts, 429s, 5xx) with jittered exponential backoff
+OPENAI_MAX_RETRIES = 3
+OPENAI_RETRY_BASE_DELAY = 0.5
+OPENAI_RETRY_MAX_DELAY = 8.0
+
+# Fail fast after this many consecutive upstream failures, probe again after the reset time
+OPENAI_BREAKER_FAILURES = 5
+OPENAI_BREAKER_RESET = 30
+
+# Hedged requests: once a request of these features is slower than the given
+# latency percentile, a duplicate is sent and the first response wins.
+# Duplicates are capped at a fraction of requests, with a small burst allowance.
+HEDGE_FEATURES = ('gpt', 'translate')
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.5
+HEDGE_BUDGET_RATIO = 0.05
+HEDGE_BUDGET_BURST = 3
+
+# Response cache for repetitive prompts, TTL in seconds per feature
+RESPONSE_CACHE_TTLS = {
+    'translate': 7 * 24 * 3600,
+    'recommend': 24 * 3600
+}
+RESPONSE_CACHE_MEMORY_BYTES = 4 * 1024 * 1024
+RESPONSE_CACHE_DISK_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_PRUNE_INTERVAL = 3600
+
+# Talk history: prompt token budget for past messages, older ones are summarised
+TALK_HISTORY_TOKEN_BUDGET = 2000
+TALK_SUMMARY_MAX_TOKENS = 300
+TALK_HISTORY_LOAD_LIMIT = 50
+TALK_PRUNE_INTERVAL = 3600
+
+# Streaming replies: minimum seconds between message edits
+STREAM_EDIT_INTERVAL = 1.0
+
+# Random fact pool
+FACT_POOL_SIZE = 20
+FACT_POOL_DEDUP_SIZE = 5000
+FACT_POOL_RETRY_DELAY = 30
+
 # Language options for translator
 LANGUAGES = {
     'en': 'English',
@@ -39,6 +130,15 @@ QUIZ_TOPICS = {
     'technology': 'Technology'
 }
 
+# Players shown on a quiz leaderboard
+LEADERBOARD_SIZE = 10
+
+# Recent bank questions listed in the prompt when generating new ones
+QUIZ_BANK_PROMPT_EXCLUDE = 30
+
+# Requests for a new question before giving up on replies that can't be parsed
+QUIZ_GENERATION_ATTEMPTS = 2
+
 # Famous personalities for talk feature
 PERSONALITIES = {
     'einstein': 'Albert Einstein',
@@ -63,6 +163,23 @@ BOOK_GENRES = [
     'Biography', 'History', 'Self-help'
 ]
 
+# Number of (user, category) dislike sets kept in memory
+DISLIKE_CACHE_SIZE = 1000
+
+# Recommendations per page and the most relevant exclusions sent with a prompt
+RECOMMENDATION_COUNT = 3
+RECOMMENDATION_PROMPT_EXCLUDE = 30
+
+# Extra requests to fill the slots of recommendations that were repeats
+RECOMMENDATION_REFILL_ATTEMPTS = 1
+
+# Shared candidate pools per category and genre
+RECOMMENDATION_POOL_BATCH = 20
+RECOMMENDATION_POOL_MAX = 200
+RECOMMENDATION_POOL_LOW = 6
+RECOMMENDATION_POOL_MAX_TOKENS = 3000
+RECOMMENDATION_POOL_RETRY_DELAY = 300
+
 # Image paths
 IMAGES = {
     'start': 'images/start.png',
@@ -72,4 +189,8 @@ IMAGES = {
     'quiz': 'images/quiz.png',
     'translate': 'images/translate.png',
     'recommend': 'images/recommend.png'
-}
\ No newline at end of file
+}
+
+# Image optimisation (requires Pillow)
+IMAGE_MAX_SIDE = 1280
+IMAGE_JPEG_QUALITY = 85
\ No newline at end of file
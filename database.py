@@ -1,41 +1,399 @@
 """Database module for SQLite operations."""
+import asyncio
 import aiosqlite
+import json
 import logging
-from typing import List, Dict, Optional
-from config import DATABASE_PATH
+import sqlite3
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, Tuple
+from config import (DATABASE_PATH, DB_POOL_SIZE, DB_CACHE_SIZE_KB,
+                    DB_CACHED_STATEMENTS, DB_BUSY_TIMEOUT,
+                    DB_FLUSH_INTERVAL_MS, DB_FLUSH_MAX_ROWS, TALK_PRUNE_INTERVAL,
+                    DISLIKE_CACHE_SIZE)
 
 logger = logging.getLogger(__name__)
 
+# quiz_stats topic of the totals over all topics
+_ALL_TOPICS = '*'
+
 
 class Database:
     """Async SQLite database handler."""
 
-    def __init__(self, db_path: str = DATABASE_PATH):
+    def __init__(self, db_path: str = DATABASE_PATH, pool_size: int = DB_POOL_SIZE):
         self.db_path = db_path
+        self.pool_size = pool_size
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+
+        # Write-behind buffers
+        self._pending_writes: List[List[Tuple[str, tuple]]] = []
+        self._pending_conversations: Dict[int, Tuple[str, Optional[str], int]] = {}
+        self._pending_persistence: Dict[Tuple[str, str], Optional[str]] = {}
+        self._pending_recommendations: Dict[Tuple[int, str, str], bool] = {}
+        self._writes_pending = asyncio.Event()
+        self._buffer_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._prune_task: Optional[asyncio.Task] = None
+
+        # Disliked items by (user_id, category), oldest first, least recently used evicted
+        self._disliked: "OrderedDict[Tuple[int, str], Dict[str, None]]" = OrderedDict()
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """Open a tuned connection for the pool."""
+        db = await aiosqlite.connect(self.db_path, timeout=DB_BUSY_TIMEOUT,
+                                     cached_statements=DB_CACHED_STATEMENTS)
+        await db.execute('PRAGMA journal_mode=WAL')
+        await db.execute('PRAGMA synchronous=NORMAL')
+        await db.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        await db.execute('PRAGMA temp_store=MEMORY')
+        return db
+
+    @asynccontextmanager
+    async def _connection(self):
+        """Borrow a connection from the pool."""
+        db = await self._pool.get()
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                await db.rollback()
+            self._pool.put_nowait(db)
+
+    def _pending_count(self) -> int:
+        """Number of buffered rows waiting to be written."""
+        return (len(self._pending_writes) + len(self._pending_conversations)
+                + len(self._pending_persistence) + len(self._pending_recommendations))
+
+    def _enqueue_write(self, sql: str, params: tuple):
+        """Buffer a write statement for the next batch."""
+        self._pending_writes.append([(sql, params)])
+        self._schedule_flush()
+
+    def _enqueue_writes(self, statements: List[Tuple[str, tuple]]):
+        """Buffer write statements that must succeed or fail together."""
+        self._pending_writes.append(statements)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Wake up the writer, immediately if the buffer is full."""
+        self._writes_pending.set()
+        if self._pending_count() >= DB_FLUSH_MAX_ROWS:
+            self._buffer_full.set()
+
+    async def _write_behind_loop(self):
+        """Flush buffered writes every DB_FLUSH_INTERVAL_MS or DB_FLUSH_MAX_ROWS.
+
+        Never cancelled: close() sets _stopping and wakes it to drain the
+        buffers and exit, so a batch is never abandoned halfway.
+        """
+        while True:
+            await self._writes_pending.wait()
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._buffer_full.wait(),
+                                           DB_FLUSH_INTERVAL_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+            if self._stopping:
+                return
+
+    async def flush(self):
+        """Write all buffered rows in a single transaction."""
+        async with self._flush_lock:
+            self._writes_pending.clear()
+            self._buffer_full.clear()
+
+            writes = self._pending_writes
+            conversations = self._pending_conversations
+            persistence = self._pending_persistence
+            recommendations = self._pending_recommendations
+            if not writes and not conversations and not persistence and not recommendations:
+                return
+            self._pending_writes = []
+            self._pending_conversations = {}
+            self._pending_persistence = {}
+            self._pending_recommendations = {}
+
+            # The transaction runs in its own task. aiosqlite commits on a worker
+            # thread, so a cancelled flush can't tell whether the batch was
+            # written. It waits for the outcome instead and is cancelled after.
+            batch = asyncio.create_task(self._write_batch(writes, conversations, persistence,
+                                                          recommendations))
+            interrupted = False
+            while not batch.done():
+                try:
+                    await asyncio.wait([batch])
+                except asyncio.CancelledError:
+                    interrupted = True
+
+            error = batch.exception()
+            if error:
+                # Rolled back, put the batch in front of anything buffered since to retry
+                self._pending_writes = writes + self._pending_writes
+                conversations.update(self._pending_conversations)
+                self._pending_conversations = conversations
+                persistence.update(self._pending_persistence)
+                self._pending_persistence = persistence
+                recommendations.update(self._pending_recommendations)
+                self._pending_recommendations = recommendations
+                self._writes_pending.set()
+                logger.error(f"Error flushing {self._pending_count()} buffered writes, "
+                             f"will retry: {error}")
+            if interrupted:
+                raise asyncio.CancelledError
+
+    async def _write_batch(self, writes: List[List[Tuple[str, tuple]]],
+                           conversations: Dict[int, Tuple[str, Optional[str], int]],
+                           persistence: Dict[Tuple[str, str], Optional[str]],
+                           recommendations: Dict[Tuple[int, str, str], bool]):
+        """Write a batch of buffered rows in one transaction, rolled back if it fails."""
+        async with self._connection() as db:
+            await db.execute('BEGIN')
+            for statements in writes:
+                if len(statements) == 1:
+                    try:
+                        await db.execute(*statements[0])
+                    except sqlite3.Error as e:
+                        logger.error(f"Buffered write failed: {e}")
+                    continue
+
+                await db.execute('SAVEPOINT buffered_group')
+                try:
+                    for sql, params in statements:
+                        await db.execute(sql, params)
+                except sqlite3.Error as e:
+                    await db.execute('ROLLBACK TO buffered_group')
+                    logger.error(f"Buffered write group failed: {e}")
+                await db.execute('RELEASE buffered_group')
+
+            if conversations:
+                await db.executemany('''
+                    INSERT OR REPLACE INTO conversations
+                        (user_id, personality, summary, summarised_seq)
+                    VALUES (?, ?, ?, ?)
+                ''', [(user_id, *conversation)
+                      for user_id, conversation in conversations.items()])
+
+            if persistence:
+                await db.executemany('''
+                    INSERT OR REPLACE INTO bot_persistence (kind, key, data)
+                    VALUES (?, ?, ?)
+                ''', [(*key, data) for key, data in persistence.items() if data is not None])
+                await db.executemany('''
+                    DELETE FROM bot_persistence WHERE kind = ? AND key = ?
+                ''', [key for key, data in persistence.items() if data is None])
+
+            if recommendations:
+                await db.executemany('''
+                    INSERT OR REPLACE INTO recommendations
+                        (user_id, category, item_name, liked)
+                    VALUES (?, ?, ?, ?)
+                ''', [(*key, liked) for key, liked in recommendations.items()])
+
+            await db.commit()
+
+    async def close(self):
+        """Flush buffered writes and close all pooled connections."""
+        if self._pool is None:
+            return
+        if self._prune_task:
+            self._prune_task.cancel()
+            try:
+                await self._prune_task
+            except asyncio.CancelledError:
+                pass
+            self._prune_task = None
+
+        # Let the writer finish its batch and drain the buffers
+        self._stopping = True
+        self._writes_pending.set()
+        self._buffer_full.set()
+        if self._writer_task:
+            await self._writer_task
+            self._writer_task = None
+        await self.flush()
+        if self._pending_count():
+            logger.error(f"Closing with {self._pending_count()} buffered writes unsaved")
+
+        for db in self._connections:
+            await db.close()
+        self._connections = []
+        self._pool = None
+        logger.info("Database connections closed")
+
+    @staticmethod
+    async def _migrate_quiz_scores(db: aiosqlite.Connection):
+        """Turn the old cumulative quiz_scores rows into sessions and totals.
+
+        Every answer used to insert the running score of its session, so the
+        last row before the total drops (or the user's last row) is where a
+        session ended.
+        """
+        cursor = await db.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quiz_scores'
+        """)
+        if not await cursor.fetchone():
+            return
+
+        await db.execute("""
+            INSERT INTO quiz_sessions (user_id, topic, correct, total, started_at, updated_at)
+            SELECT user_id, topic, correct_answers, total_questions, timestamp, timestamp
+            FROM (
+                SELECT *, LEAD(total_questions) OVER (
+                    PARTITION BY user_id, topic ORDER BY rowid
+                ) AS next_total
+                FROM quiz_scores
+            )
+            WHERE next_total IS NULL OR next_total <= total_questions
+        """)
+        await db.execute("""
+            INSERT INTO quiz_stats (user_id, topic, correct, total)
+            SELECT user_id, topic, SUM(correct), SUM(total)
+            FROM quiz_sessions
+            GROUP BY user_id, topic
+            ON CONFLICT (user_id, topic) DO UPDATE SET
+                correct = correct + excluded.correct,
+                total = total + excluded.total
+        """)
+        await db.execute('DROP TABLE quiz_scores')
+        logger.info("Migrated quiz_scores to quiz_sessions and quiz_stats")
+
+    @staticmethod
+    async def _build_quiz_rankings(db: aiosqlite.Connection):
+        """Fill overall totals and rank counts for stats recorded before rankings existed."""
+        cursor = await db.execute('SELECT 1 FROM quiz_rank_counts LIMIT 1')
+        if await cursor.fetchone():
+            return
+
+        await db.execute("""
+            INSERT OR REPLACE INTO quiz_stats (user_id, topic, correct, total)
+            SELECT user_id, ?, SUM(correct), SUM(total)
+            FROM quiz_stats
+            WHERE topic != ?
+            GROUP BY user_id
+        """, (_ALL_TOPICS, _ALL_TOPICS))
+        await db.execute("""
+            INSERT INTO quiz_rank_counts (topic, correct, users)
+            SELECT topic, correct, COUNT(*)
+            FROM quiz_stats
+            WHERE correct > 0
+            GROUP BY topic, correct
+        """)
+
+    @staticmethod
+    async def _add_missing_columns(db: aiosqlite.Connection, table: str,
+                                   columns: Dict[str, str]):
+        """Add columns introduced after a table was first created."""
+        cursor = await db.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in await cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                await db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
 
     async def initialize(self):
-        """Initialize database tables."""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Quiz scores table
+        """Open the connection pool and initialize database tables."""
+        if self._pool is not None:
+            return
+        self._pool = asyncio.Queue()
+        for _ in range(self.pool_size):
+            db = await self._open_connection()
+            self._connections.append(db)
+            self._pool.put_nowait(db)
+
+        async with self._connection() as db:
+            # Quiz sessions, one row per topic a user plays
             await db.execute('''
-                CREATE TABLE IF NOT EXISTS quiz_scores (
+                CREATE TABLE IF NOT EXISTS quiz_sessions (
+                    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
                     topic TEXT,
-                    correct_answers INTEGER,
-                    total_questions INTEGER,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, topic, timestamp)
+                    correct INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
 
+            # Quiz totals per user and topic, updated with every answer
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_stats (
+                    user_id INTEGER,
+                    topic TEXT,
+                    correct INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    PRIMARY KEY (user_id, topic)
+                ) WITHOUT ROWID
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_quiz_stats_rank
+                ON quiz_stats (topic, correct DESC)
+            ''')
+
+            # Number of users per topic with each count of correct answers,
+            # so a rank is a sum over scores rather than a count of users
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_rank_counts (
+                    topic TEXT,
+                    correct INTEGER,
+                    users INTEGER,
+                    PRIMARY KEY (topic, correct)
+                ) WITHOUT ROWID
+            ''')
+
+            # Display names for the leaderboard
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_players (
+                    user_id INTEGER PRIMARY KEY,
+                    name TEXT
+                )
+            ''')
+            await self._migrate_quiz_scores(db)
+            await self._build_quiz_rankings(db)
+
             # User conversations table (for personality talks)
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS conversations (
                     user_id INTEGER PRIMARY KEY,
                     personality TEXT,
-                    context TEXT
+                    context TEXT,
+                    summary TEXT,
+                    summarised_seq INTEGER DEFAULT 0
                 )
             ''')
+            await self._add_missing_columns(db, 'conversations', {
+                'summary': 'TEXT',
+                'summarised_seq': 'INTEGER DEFAULT 0'
+            })
+
+            # Personality talk messages, one row per message
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    user_id INTEGER,
+                    personality TEXT,
+                    seq INTEGER,
+                    role TEXT,
+                    content TEXT,
+                    PRIMARY KEY (user_id, personality, seq)
+                ) WITHOUT ROWID
+            ''')
+
+            # Move histories saved as a JSON blob into the message table
+            await db.execute('''
+                INSERT OR IGNORE INTO conversation_messages
+                    (user_id, personality, seq, role, content)
+                SELECT c.user_id, c.personality, m.key + 1,
+                       json_extract(m.value, '$.role'), json_extract(m.value, '$.content')
+                FROM conversations c, json_each(c.context) m
+                WHERE c.context IS NOT NULL
+            ''')
+            await db.execute('''
+                UPDATE conversations SET context = NULL WHERE context IS NOT NULL
+            ''')
 
             # Recommendations table
             await db.execute('''
@@ -48,6 +406,25 @@ class Database:
                     PRIMARY KEY (user_id, category, item_name)
                 )
             ''')
+            # Covers the dislike lookup, rowid gives the order they were recorded
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_recommendations_disliked
+                ON recommendations (user_id, category, liked, item_name)
+            ''')
+
+            # Recommendation candidates shared by all users of a genre.
+            # Ids only grow, users keep a cursor of how far they have seen.
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS recommendation_pool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    category TEXT,
+                    genre TEXT,
+                    title_key INTEGER,
+                    title TEXT,
+                    text TEXT,
+                    UNIQUE (category, genre, title_key)
+                )
+            ''')
 
             # User preferences table
             await db.execute('''
@@ -59,34 +436,165 @@ class Database:
                 )
             ''')
 
+            # Telegram file_id cache for bot images
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS media_cache (
+                    image_key TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    file_id TEXT
+                )
+            ''')
+
+            # Shared quiz question bank
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_questions (
+                    question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT,
+                    question TEXT,
+                    answer TEXT,
+                    options TEXT,
+                    correct_index INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (topic, question)
+                )
+            ''')
+            await self._add_missing_columns(db, 'quiz_questions', {
+                'options': 'TEXT',
+                'correct_index': 'INTEGER'
+            })
+
+            # Bank questions each user has already been asked
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_seen_questions (
+                    user_id INTEGER,
+                    question_id INTEGER,
+                    PRIMARY KEY (user_id, question_id)
+                )
+            ''')
+
+            # Pre-generated random facts (served = 0 means still in the pool)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS random_facts (
+                    fact_hash TEXT PRIMARY KEY,
+                    fact TEXT,
+                    served BOOLEAN DEFAULT 0,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Cached OpenAI responses for repetitive prompts
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    feature TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    expires_at REAL,
+                    last_used REAL
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_response_cache_last_used
+                ON response_cache (last_used)
+            ''')
+
+            # Telegram user, chat and bot data and conversation states, as JSON
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS bot_persistence (
+                    kind TEXT,
+                    key TEXT,
+                    data TEXT,
+                    PRIMARY KEY (kind, key)
+                ) WITHOUT ROWID
+            ''')
+
             await db.commit()
             logger.info("Database initialized successfully")
 
-    async def save_quiz_score(self, user_id: int, topic: str,
-                            correct: int, total: int):
-        """Save quiz score for a user."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT INTO quiz_scores (user_id, topic, correct_answers, total_questions)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, topic, correct, total))
+        self._stopping = False
+        self._writer_task = asyncio.create_task(self._write_behind_loop())
+        self._prune_task = asyncio.create_task(self._prune_loop())
+
+    async def _prune_loop(self):
+        """Periodically delete talk messages nobody will load again."""
+        while True:
+            await asyncio.sleep(TALK_PRUNE_INTERVAL)
+            try:
+                await self.prune_conversation_messages()
+            except Exception as e:
+                logger.error(f"Error pruning conversation messages: {e}")
+
+    async def start_quiz_session(self, user_id: int, topic: str,
+                                 name: Optional[str] = None) -> int:
+        """Start a quiz session and return its id."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                INSERT INTO quiz_sessions (user_id, topic) VALUES (?, ?)
+            ''', (user_id, topic))
+            session_id = cursor.lastrowid
+            if name:
+                await db.execute('''
+                    INSERT OR REPLACE INTO quiz_players (user_id, name) VALUES (?, ?)
+                ''', (user_id, name))
             await db.commit()
+            return session_id
+
+    async def record_quiz_answer(self, session_id: int, user_id: int, topic: str,
+                                 is_correct: bool):
+        """Count an answer in its session, the user's totals and the rankings (buffered).
+
+        All updates are written in the same transaction.
+        """
+        correct = int(is_correct)
+        statements = [('''
+            UPDATE quiz_sessions
+            SET correct = correct + ?, total = total + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE session_id = ?
+        ''', (correct, session_id))]
+
+        for stats_topic in (topic, _ALL_TOPICS):
+            if is_correct:
+                # The user leaves the group of their old score...
+                statements.append(('''
+                    UPDATE quiz_rank_counts SET users = users - 1
+                    WHERE topic = ? AND correct = (
+                        SELECT correct FROM quiz_stats WHERE user_id = ? AND topic = ?
+                    )
+                ''', (stats_topic, user_id, stats_topic)))
+
+            statements.append(('''
+                INSERT INTO quiz_stats (user_id, topic, correct, total)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT (user_id, topic) DO UPDATE SET
+                    correct = correct + excluded.correct,
+                    total = total + 1
+            ''', (user_id, stats_topic, correct)))
+
+            if is_correct:
+                # ...and joins the group of the new one
+                statements.append(('''
+                    INSERT INTO quiz_rank_counts (topic, correct, users)
+                    SELECT topic, correct, 1 FROM quiz_stats
+                    WHERE user_id = ? AND topic = ?
+                    ON CONFLICT (topic, correct) DO UPDATE SET users = users + 1
+                ''', (user_id, stats_topic)))
+
+        self._enqueue_writes(statements)
 
     async def get_quiz_stats(self, user_id: int, topic: Optional[str] = None) -> Dict:
-        """Get quiz statistics for a user."""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Get quiz statistics for a user, for one topic or all of them."""
+        await self.flush()
+        async with self._connection() as db:
             if topic:
                 cursor = await db.execute('''
-                    SELECT SUM(correct_answers), SUM(total_questions)
-                    FROM quiz_scores
+                    SELECT correct, total FROM quiz_stats
                     WHERE user_id = ? AND topic = ?
                 ''', (user_id, topic))
             else:
                 cursor = await db.execute('''
-                    SELECT SUM(correct_answers), SUM(total_questions)
-                    FROM quiz_scores
-                    WHERE user_id = ?
-                ''', (user_id,))
+                    SELECT correct, total FROM quiz_stats
+                    WHERE user_id = ? AND topic = ?
+                ''', (user_id, _ALL_TOPICS))
 
             row = await cursor.fetchone()
             if row and row[0] is not None:
@@ -97,62 +605,311 @@ class Database:
                 }
             return {'correct': 0, 'total': 0, 'percentage': 0}
 
-    async def save_conversation_context(self, user_id: int, personality: str,
-                                      context: str):
-        """Save conversation context for personality talk."""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_quiz_leaderboard(self, topic: Optional[str] = None,
+                                   limit: int = 10) -> List[Dict]:
+        """Get the users with the most correct answers, for one topic or overall."""
+        await self.flush()
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT s.user_id, p.name, s.correct, s.total
+                FROM quiz_stats s
+                LEFT JOIN quiz_players p ON p.user_id = s.user_id
+                WHERE s.topic = ? AND s.correct > 0
+                ORDER BY s.correct DESC
+                LIMIT ?
+            ''', (topic or _ALL_TOPICS, limit))
+            rows = await cursor.fetchall()
+
+        leaders = []
+        for i, (user_id, name, correct, total) in enumerate(rows):
+            # Users with the same score share a rank
+            rank = leaders[-1]['rank'] if leaders and leaders[-1]['correct'] == correct else i + 1
+            leaders.append({'rank': rank, 'user_id': user_id, 'name': name,
+                            'correct': correct, 'total': total})
+        return leaders
+
+    async def get_quiz_rank(self, user_id: int, topic: Optional[str] = None) -> Optional[Dict]:
+        """Get a user's rank among all ranked players, for one topic or overall."""
+        await self.flush()
+        topic = topic or _ALL_TOPICS
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT correct, total FROM quiz_stats
+                WHERE user_id = ? AND topic = ?
+            ''', (user_id, topic))
+            row = await cursor.fetchone()
+            if not row or not row[0]:
+                return None
+            correct, total = row
+
+            cursor = await db.execute('''
+                SELECT COALESCE(SUM(CASE WHEN correct > ? THEN users END), 0),
+                       COALESCE(SUM(users), 0)
+                FROM quiz_rank_counts
+                WHERE topic = ?
+            ''', (correct, topic))
+            ahead, players = await cursor.fetchone()
+            return {'rank': ahead + 1, 'players': players, 'correct': correct, 'total': total}
+
+    async def get_unseen_quiz_question(self, user_id: int, topic: str,
+                                       exclude_ids: Optional[List[int]] = None,
+                                       multiple_choice: bool = False) -> Optional[Dict]:
+        """Get a random bank question the user has not been asked yet."""
+        exclude_ids = exclude_ids or []
+        placeholders = ', '.join('?' * len(exclude_ids))
+        choice_filter = 'AND options IS NOT NULL' if multiple_choice else ''
+        async with self._connection() as db:
+            cursor = await db.execute(f'''
+                SELECT question_id, question, answer, options, correct_index
+                FROM quiz_questions q
+                WHERE topic = ? {choice_filter}
+                  AND question_id NOT IN ({placeholders})
+                  AND NOT EXISTS (
+                      SELECT 1 FROM quiz_seen_questions s
+                      WHERE s.user_id = ? AND s.question_id = q.question_id
+                  )
+                ORDER BY RANDOM()
+                LIMIT 1
+            ''', (topic, *exclude_ids, user_id))
+            row = await cursor.fetchone()
+            if row:
+                return {'question_id': row[0], 'question': row[1], 'answer': row[2],
+                        'options': json.loads(row[3]) if row[3] else None,
+                        'correct_index': row[4]}
+            return None
+
+    async def get_recent_quiz_questions(self, topic: str, limit: int) -> List[str]:
+        """Get the most recently added bank questions for a topic."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT question FROM quiz_questions
+                WHERE topic = ?
+                ORDER BY question_id DESC
+                LIMIT ?
+            ''', (topic, limit))
+            rows = await cursor.fetchall()
+            return [row[0] for row in rows]
+
+    async def add_quiz_question(self, topic: str, question: str, answer: str,
+                                options: Optional[List[str]] = None,
+                                correct_index: Optional[int] = None) -> Optional[int]:
+        """Add a generated question to the bank and return its id."""
+        async with self._connection() as db:
             await db.execute('''
-                INSERT OR REPLACE INTO conversations (user_id, personality, context)
-                VALUES (?, ?, ?)
-            ''', (user_id, personality, context))
+                INSERT OR IGNORE INTO quiz_questions
+                (topic, question, answer, options, correct_index)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (topic, question, answer,
+                  json.dumps(options) if options else None, correct_index))
             await db.commit()
+            cursor = await db.execute('''
+                SELECT question_id FROM quiz_questions
+                WHERE topic = ? AND question = ?
+            ''', (topic, question))
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+    async def mark_quiz_question_seen(self, user_id: int, question_id: int):
+        """Record that a user has been asked a bank question (buffered)."""
+        self._enqueue_write('''
+            INSERT OR IGNORE INTO quiz_seen_questions (user_id, question_id)
+            VALUES (?, ?)
+        ''', (user_id, question_id))
+
+    async def start_conversation(self, user_id: int, personality: str):
+        """Start a new personality talk, dropping the previous one (buffered)."""
+        self._enqueue_write('''
+            DELETE FROM conversation_messages WHERE user_id = ?
+        ''', (user_id,))
+        self._pending_conversations[user_id] = (personality, None, 0)
+        self._schedule_flush()
 
-    async def get_conversation_context(self, user_id: int) -> Optional[Dict]:
-        """Get conversation context for a user."""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def append_conversation_messages(self, user_id: int, personality: str,
+                                           first_seq: int, messages: List[Dict[str, str]]):
+        """Append new talk messages, numbered from first_seq (buffered)."""
+        for seq, message in enumerate(messages, start=first_seq):
+            self._enqueue_write('''
+                INSERT OR REPLACE INTO conversation_messages
+                    (user_id, personality, seq, role, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, personality, seq, message['role'], message['content']))
+
+    async def save_conversation_summary(self, user_id: int, personality: str,
+                                        summary: str, summarised_seq: int):
+        """Save the rolling summary covering messages up to summarised_seq (buffered).
+
+        Repeated saves for the same user before a flush are coalesced.
+        """
+        self._pending_conversations[user_id] = (personality, summary, summarised_seq)
+        self._schedule_flush()
+
+    async def get_conversation(self, user_id: int, limit: int) -> Optional[Dict]:
+        """Get the current talk of a user with its last unsummarised messages."""
+        await self.flush()
+        async with self._connection() as db:
             cursor = await db.execute('''
-                SELECT personality, context FROM conversations
+                SELECT personality, summary, summarised_seq FROM conversations
                 WHERE user_id = ?
             ''', (user_id,))
             row = await cursor.fetchone()
-            if row:
-                return {'personality': row[0], 'context': row[1]}
-            return None
+            if not row:
+                return None
+            personality, summary, summarised_seq = row
+
+            cursor = await db.execute('''
+                SELECT seq, role, content FROM conversation_messages
+                WHERE user_id = ? AND personality = ? AND seq > ?
+                ORDER BY seq DESC
+                LIMIT ?
+            ''', (user_id, personality, summarised_seq or 0, limit))
+            rows = list(reversed(await cursor.fetchall()))
+
+            last_seq = rows[-1][0] if rows else summarised_seq or 0
+            return {
+                'personality': personality,
+                'summary': summary,
+                'summarised_seq': summarised_seq or 0,
+                'messages': [{'role': role, 'content': content} for _, role, content in rows],
+                'first_seq': rows[0][0] if rows else last_seq + 1,
+                'last_seq': last_seq
+            }
+
+    async def get_conversation_messages(self, user_id: int, personality: str,
+                                        after_seq: int, until_seq: int,
+                                        limit: int) -> List[Tuple[int, Dict[str, str]]]:
+        """Get talk messages with after_seq < seq <= until_seq, oldest first."""
+        await self.flush()
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT seq, role, content FROM conversation_messages
+                WHERE user_id = ? AND personality = ? AND seq > ? AND seq <= ?
+                ORDER BY seq
+                LIMIT ?
+            ''', (user_id, personality, after_seq, until_seq, limit))
+            rows = await cursor.fetchall()
+            return [(seq, {'role': role, 'content': content}) for seq, role, content in rows]
 
     async def clear_conversation_context(self, user_id: int):
-        """Clear conversation context for a user."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                DELETE FROM conversations WHERE user_id = ?
-            ''', (user_id,))
+        """Clear conversation context for a user (buffered)."""
+        self._pending_conversations.pop(user_id, None)
+        self._enqueue_write('''
+            DELETE FROM conversations WHERE user_id = ?
+        ''', (user_id,))
+        self._enqueue_write('''
+            DELETE FROM conversation_messages WHERE user_id = ?
+        ''', (user_id,))
+
+    async def prune_conversation_messages(self) -> int:
+        """Delete messages already folded into a summary or left by an old talk."""
+        await self.flush()
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                DELETE FROM conversation_messages
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM conversations c
+                    WHERE c.user_id = conversation_messages.user_id
+                      AND c.personality = conversation_messages.personality
+                      AND c.summarised_seq < conversation_messages.seq
+                )
+            ''')
             await db.commit()
+            if cursor.rowcount:
+                logger.info(f"Pruned {cursor.rowcount} conversation messages")
+            return cursor.rowcount
+
+    async def save_recommendations(self, user_id: int, category: str,
+                                   item_names: List[str], liked: bool):
+        """Save feedback on several recommendations (buffered).
+
+        A cached dislike set of the user is updated in place, so it stays
+        valid without being read again.
+        """
+        cached = self._disliked.get((user_id, category))
+        for item_name in item_names:
+            self._pending_recommendations[(user_id, category, item_name)] = liked
+            if cached is not None:
+                cached.pop(item_name, None)
+                if not liked:
+                    cached[item_name] = None
+        self._schedule_flush()
 
     async def save_recommendation(self, user_id: int, category: str,
                                 item_name: str, liked: bool):
-        """Save recommendation feedback."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO recommendations 
-                (user_id, category, item_name, liked)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, category, item_name, liked))
-            await db.commit()
+        """Save recommendation feedback (buffered)."""
+        await self.save_recommendations(user_id, category, [item_name], liked)
 
     async def get_disliked_recommendations(self, user_id: int,
                                           category: str) -> List[str]:
-        """Get list of disliked recommendations."""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Get list of disliked recommendations, oldest first.
+
+        Each user's list is read from disk once and then served from memory.
+        """
+        key = (user_id, category)
+        cached = self._disliked.get(key)
+        if cached is None:
+            async with self._connection() as db:
+                cursor = await db.execute('''
+                    SELECT item_name FROM recommendations
+                    WHERE user_id = ? AND category = ? AND liked = 0
+                    ORDER BY rowid
+                ''', (user_id, category))
+                rows = await cursor.fetchall()
+            cached = dict.fromkeys(row[0] for row in rows)
+
+            # Apply feedback that has not been flushed yet
+            for (pending_user, pending_category, item_name), liked in self._pending_recommendations.items():
+                if pending_user == user_id and pending_category == category:
+                    cached.pop(item_name, None)
+                    if not liked:
+                        cached[item_name] = None
+
+            self._disliked[key] = cached
+            while len(self._disliked) > DISLIKE_CACHE_SIZE:
+                self._disliked.popitem(last=False)
+        else:
+            self._disliked.move_to_end(key)
+        return list(cached)
+
+    async def get_recommendation_pool(self) -> List[Dict]:
+        """Get all recommendation candidates, oldest first."""
+        async with self._connection() as db:
             cursor = await db.execute('''
-                SELECT item_name FROM recommendations
-                WHERE user_id = ? AND category = ? AND liked = 0
-            ''', (user_id, category))
+                SELECT id, category, genre, title, text
+                FROM recommendation_pool ORDER BY id
+            ''')
             rows = await cursor.fetchall()
-            return [row[0] for row in rows]
+            return [{'id': row[0], 'category': row[1], 'genre': row[2],
+                     'title': row[3], 'text': row[4]} for row in rows]
+
+    async def add_recommendation_pool_items(self, category: str, genre: str,
+                                            items: List[Tuple[int, str, str]]) -> List[int]:
+        """Add (title_key, title, text) candidates to a pool. Returns their ids.
+
+        A title that was trimmed from the pool comes back with a new id.
+        """
+        async with self._connection() as db:
+            ids = []
+            for key, title, text in items:
+                cursor = await db.execute('''
+                    INSERT OR REPLACE INTO recommendation_pool
+                        (category, genre, title_key, title, text)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (category, genre, key, title, text))
+                ids.append(cursor.lastrowid)
+            await db.commit()
+            return ids
+
+    async def trim_recommendation_pool(self, category: str, genre: str, last_id: int):
+        """Delete the candidates of a pool up to and including last_id (buffered)."""
+        self._enqueue_write('''
+            DELETE FROM recommendation_pool
+            WHERE category = ? AND genre = ? AND id <= ?
+        ''', (category, genre, last_id))
 
     async def save_user_preference(self, user_id: int, pref_type: str,
                                  pref_value: str):
         """Save user preference."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO user_preferences 
                 (user_id, preference_type, preference_value)
@@ -162,10 +919,150 @@ class Database:
 
     async def get_user_preference(self, user_id: int, pref_type: str) -> Optional[str]:
         """Get user preference."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             cursor = await db.execute('''
                 SELECT preference_value FROM user_preferences
                 WHERE user_id = ? AND preference_type = ?
             ''', (user_id, pref_type))
             row = await cursor.fetchone()
-            return row[0] if row else None
\ No newline at end of file
+            return row[0] if row else None
+
+    async def get_media_file_ids(self) -> Dict[str, Dict]:
+        """Get cached Telegram file_ids for all images."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT image_key, content_hash, file_id FROM media_cache
+            ''')
+            rows = await cursor.fetchall()
+            return {row[0]: {'content_hash': row[1], 'file_id': row[2]} for row in rows}
+
+    async def save_media_file_id(self, image_key: str, content_hash: str,
+                                 file_id: str):
+        """Save Telegram file_id for an uploaded image."""
+        async with self._connection() as db:
+            await db.execute('''
+                INSERT OR REPLACE INTO media_cache (image_key, content_hash, file_id)
+                VALUES (?, ?, ?)
+            ''', (image_key, content_hash, file_id))
+            await db.commit()
+
+    async def delete_media_file_id(self, image_key: str):
+        """Forget cached Telegram file_id for an image."""
+        async with self._connection() as db:
+            await db.execute('''
+                DELETE FROM media_cache WHERE image_key = ?
+            ''', (image_key,))
+            await db.commit()
+
+    async def get_pooled_facts(self, limit: int) -> List[Dict]:
+        """Get pre-generated facts that have not been served yet."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT fact_hash, fact FROM random_facts
+                WHERE served = 0
+                ORDER BY timestamp
+                LIMIT ?
+            ''', (limit,))
+            rows = await cursor.fetchall()
+            return [{'fact_hash': row[0], 'fact': row[1]} for row in rows]
+
+    async def get_fact_hashes(self, limit: int) -> List[str]:
+        """Get hashes of the most recently generated facts."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT fact_hash FROM random_facts
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (limit,))
+            rows = await cursor.fetchall()
+            return [row[0] for row in rows]
+
+    async def add_pooled_fact(self, fact_hash: str, fact: str):
+        """Save a pre-generated fact to the pool (buffered)."""
+        self._enqueue_write('''
+            INSERT OR IGNORE INTO random_facts (fact_hash, fact)
+            VALUES (?, ?)
+        ''', (fact_hash, fact))
+
+    async def mark_fact_served(self, fact_hash: str, fact: str):
+        """Mark a fact as served so it is never pooled again (buffered)."""
+        self._enqueue_write('''
+            INSERT OR REPLACE INTO random_facts (fact_hash, fact, served)
+            VALUES (?, ?, 1)
+        ''', (fact_hash, fact))
+
+    async def get_cached_response(self, cache_key: str, now: float) -> Optional[Tuple[str, float]]:
+        """Get an unexpired cached response and its expiry time."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT response, expires_at FROM response_cache
+                WHERE cache_key = ? AND expires_at > ?
+            ''', (cache_key, now))
+            row = await cursor.fetchone()
+        if not row:
+            return None
+
+        self._enqueue_write('''
+            UPDATE response_cache SET last_used = ? WHERE cache_key = ?
+        ''', (now, cache_key))
+        return row[0], row[1]
+
+    async def save_cached_response(self, cache_key: str, feature: str, response: str,
+                                   size: int, expires_at: float, now: float):
+        """Save a response to the cache (buffered)."""
+        self._enqueue_write('''
+            INSERT OR REPLACE INTO response_cache
+                (cache_key, feature, response, size, expires_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (cache_key, feature, response, size, expires_at, now))
+
+    async def prune_response_cache(self, max_bytes: int, now: float) -> Tuple[int, int]:
+        """Drop expired responses, then the least recently used beyond max_bytes.
+
+        Returns the number of expired and evicted rows.
+        """
+        await self.flush()
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                DELETE FROM response_cache WHERE expires_at <= ?
+            ''', (now,))
+            expired = cursor.rowcount
+
+            cursor = await db.execute('''
+                DELETE FROM response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               SUM(size) OVER (ORDER BY last_used DESC) AS running_size
+                        FROM response_cache
+                    ) WHERE running_size > ?
+                )
+            ''', (max_bytes,))
+            evicted = cursor.rowcount
+            await db.commit()
+            return expired, evicted
+
+    async def get_response_cache_size(self) -> int:
+        """Total bytes of cached responses on disk."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT COALESCE(SUM(size), 0) FROM response_cache
+            ''')
+            row = await cursor.fetchone()
+            return row[0]
+
+    async def get_persistent_data(self, kind: str) -> Dict[str, str]:
+        """Get all persisted JSON documents of a kind, by key."""
+        async with self._connection() as db:
+            cursor = await db.execute('''
+                SELECT key, data FROM bot_persistence WHERE kind = ?
+            ''', (kind,))
+            rows = await cursor.fetchall()
+            return {row[0]: row[1] for row in rows}
+
+    async def save_persistent_data(self, kind: str, key: str, data: Optional[str]):
+        """Save a JSON document, or delete it when data is None (buffered).
+
+        Repeated saves of the same key before a flush are coalesced.
+        """
+        self._pending_persistence[(kind, key)] = data
+        self._schedule_flush()
@@ -1,10 +1,11 @@
 """GPT command handler."""
 import logging
-import os
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.keyboards import get_finish_keyboard
-from config import IMAGES
+from utils.streaming import stream_reply
+from utils.rate_limiter import PRIORITY_INTERACTIVE
+from utils.resilience import OpenAIUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +20,14 @@ async def gpt_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Set conversation state
     context.user_data['state'] = 'gpt_chat'
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send initial message with image
     try:
-        if os.path.exists(IMAGES['gpt']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['gpt'], 'rb'),
+        if media_cache.has_image('gpt'):
+            await media_cache.reply_photo(
+                update.message, 'gpt',
                 caption="🤖 **ChatGPT Interface**\n\nI'm ready to help! Send me any question or message, "
                         "and I'll provide a thoughtful response.\n\nType your message below:",
                 reply_markup=get_finish_keyboard()
@@ -57,10 +61,13 @@ async def gpt_command_from_callback(update: Update, context: ContextTypes.DEFAUL
     # Set conversation state
     context.user_data['state'] = 'gpt_chat'
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     try:
-        if os.path.exists(IMAGES['gpt']):
-            await query.message.reply_photo(
-                photo=open(IMAGES['gpt'], 'rb'),
+        if media_cache.has_image('gpt'):
+            await media_cache.reply_photo(
+                query.message, 'gpt',
                 caption="🤖 **ChatGPT Interface**\n\nI'm ready to help! Send me any question or message, "
                         "and I'll provide a thoughtful response.\n\nType your message below:",
                 reply_markup=get_finish_keyboard()
@@ -92,20 +99,19 @@ async def handle_gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_message = update.message.text
     logger.info(f"User {update.effective_user.id} sent GPT message: {user_message[:50]}...")
 
-    # Send typing indicator
-    await update.message.chat.send_action('typing')
-
     # Get OpenAI client from context
     openai_client = context.bot_data.get('openai_client')
 
-    # Generate response
-    response = await openai_client.generate_response(user_message)
-
-    # Send response with keyboard
-    await update.message.reply_text(
-        response,
-        reply_markup=get_finish_keyboard()
-    )
+    # Stream response into a message with keyboard, failures are shown in it
+    try:
+        await stream_reply(
+            update.message,
+            openai_client.stream_response(user_message, feature='gpt',
+                                          priority=PRIORITY_INTERACTIVE),
+            reply_markup=get_finish_keyboard()
+        )
+    except OpenAIUnavailable:
+        pass
 
     return GPT_CHAT
 
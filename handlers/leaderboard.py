@@ -0,0 +1,76 @@
+"""Quiz leaderboard command handler."""
+import logging
+from typing import Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from utils.keyboards import get_leaderboard_keyboard
+from config import QUIZ_TOPICS, LEADERBOARD_SIZE
+
+logger = logging.getLogger(__name__)
+
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+
+async def build_leaderboard(db, user, topic_id: Optional[str]) -> str:
+    """Build the leaderboard text for a topic, or overall when topic_id is None."""
+    title = QUIZ_TOPICS[topic_id] if topic_id else "All Topics"
+    leaders = await db.get_quiz_leaderboard(topic_id, LEADERBOARD_SIZE)
+    if not leaders:
+        return f"🏆 **Leaderboard - {title}**\n\nNobody has scored yet. Be the first with /quiz!"
+
+    lines = [f"🏆 **Leaderboard - {title}**\n"]
+    for leader in leaders:
+        name = escape_markdown(leader['name'] or f"Player {leader['user_id']}")
+        place = MEDALS.get(leader['rank'], f"{leader['rank']}.")
+        lines.append(f"{place} {name} - {leader['correct']} correct of {leader['total']}")
+
+    my_rank = await db.get_quiz_rank(user.id, topic_id)
+    if my_rank:
+        lines.append(f"\n📍 Your rank: {my_rank['rank']} of {my_rank['players']} "
+                     f"({my_rank['correct']} correct of {my_rank['total']})")
+    else:
+        lines.append("\n📍 You haven't scored in this category yet.")
+
+    return '\n'.join(lines)
+
+
+async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /leaderboard command, optionally for a topic: /leaderboard science."""
+    logger.info(f"User {update.effective_user.id} requested the leaderboard")
+
+    topic_id = context.args[0].lower() if context.args else None
+    if topic_id and topic_id not in QUIZ_TOPICS:
+        await update.message.reply_text(
+            f"Unknown topic. Choose one of: {', '.join(QUIZ_TOPICS)}",
+            reply_markup=get_leaderboard_keyboard()
+        )
+        return
+
+    # Get database from context
+    db = context.bot_data.get('database')
+
+    await update.message.reply_text(
+        await build_leaderboard(db, update.effective_user, topic_id),
+        reply_markup=get_leaderboard_keyboard(),
+        parse_mode='Markdown'
+    )
+
+
+async def leaderboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle leaderboard topic buttons."""
+    query = update.callback_query
+    await query.answer()
+
+    topic_id = query.data.split('_', 1)[1]
+    if topic_id not in QUIZ_TOPICS:
+        topic_id = None
+
+    # Get database from context
+    db = context.bot_data.get('database')
+
+    await query.message.reply_text(
+        await build_leaderboard(db, update.effective_user, topic_id),
+        reply_markup=get_leaderboard_keyboard(),
+        parse_mode='Markdown'
+    )
@@ -1,28 +1,41 @@
 """Quiz command handler."""
+import asyncio
 import logging
-import os
+import re
+from typing import Dict
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.keyboards import (get_quiz_topics_keyboard, get_quiz_continue_keyboard,
+                           get_quiz_mode_keyboard, get_quiz_options_keyboard,
                            get_finish_keyboard)
-from utils.prompts import get_quiz_prompt, get_quiz_validation_prompt
-from config import IMAGES, QUIZ_TOPICS
+from utils.prompts import get_quiz_prompt, get_quiz_choice_prompt, get_quiz_validation_prompt
+from utils.answer_check import check_answer, validation_stats
+from utils.rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_STANDARD, PRIORITY_PREFETCH
+from utils.resilience import OpenAIUnavailable, UpstreamError
+from utils.user_locks import serialized_per_user
+from config import QUIZ_TOPICS, QUIZ_BANK_PROMPT_EXCLUDE, QUIZ_GENERATION_ATTEMPTS
 
 logger = logging.getLogger(__name__)
 
 # Conversation states
 QUIZ_ANSWER = 3
 
+# In-flight next question prefetches per user
+_prefetch_tasks: Dict[int, asyncio.Task] = {}
+
 
 async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /quiz command."""
     logger.info(f"User {update.effective_user.id} started quiz")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send topic selection
     try:
-        if os.path.exists(IMAGES['quiz']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['quiz'], 'rb'),
+        if media_cache.has_image('quiz'):
+            await media_cache.reply_photo(
+                update.message, 'quiz',
                 caption="🧠 **Quiz Time!**\n\nChoose a topic to test your knowledge:",
                 reply_markup=get_quiz_topics_keyboard()
             )
@@ -48,10 +61,13 @@ async def quiz_command_from_callback(update: Update, context: ContextTypes.DEFAU
 
     logger.info(f"User {query.from_user.id} started quiz from button")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     try:
-        if os.path.exists(IMAGES['quiz']):
-            await query.message.reply_photo(
-                photo=open(IMAGES['quiz'], 'rb'),
+        if media_cache.has_image('quiz'):
+            await media_cache.reply_photo(
+                query.message, 'quiz',
                 caption="🧠 **Quiz Time!**\n\nChoose a topic to test your knowledge:",
                 reply_markup=get_quiz_topics_keyboard()
             )
@@ -70,6 +86,7 @@ async def quiz_command_from_callback(update: Update, context: ContextTypes.DEFAU
         )
 
 
+@serialized_per_user
 async def topic_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle topic selection."""
     query = update.callback_query
@@ -80,36 +97,56 @@ async def topic_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     logger.info(f"User {update.effective_user.id} selected topic: {topic_name}")
 
+    # Drop any question prefetched for the previous topic
+    cancel_question_prefetch(update.effective_user.id, context)
+
     # Initialize quiz state
     context.user_data['quiz_topic'] = topic_id
     context.user_data['quiz_topic_name'] = topic_name
     context.user_data['quiz_score'] = 0
     context.user_data['quiz_total'] = 0
     context.user_data['quiz_questions'] = []
-    context.user_data['state'] = 'quiz'
+    context.user_data['quiz_question_ids'] = []
 
-    # Generate first question
-    await generate_question(query.message, context)
+    # Start a new scoring session for this topic
+    db = context.bot_data.get('database')
+    context.user_data['quiz_session_id'] = await db.start_quiz_session(
+        update.effective_user.id, topic_id, update.effective_user.first_name
+    )
+
+    # Ask for the answer mode
+    await query.message.reply_text(
+        f"🧠 **{topic_name}**\n\nHow would you like to answer?",
+        reply_markup=get_quiz_mode_keyboard(),
+        parse_mode='Markdown'
+    )
 
     return QUIZ_ANSWER
 
 
-async def generate_question(message, context: ContextTypes.DEFAULT_TYPE):
-    """Generate a quiz question."""
-    topic = context.user_data['quiz_topic_name']
-    previous_questions = context.user_data.get('quiz_questions', [])
+@serialized_per_user
+async def mode_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle answer mode selection."""
+    query = update.callback_query
+    await query.answer()
 
-    # Send typing indicator
-    await message.chat.send_action('typing')
+    if 'quiz_topic' not in context.user_data:
+        return ConversationHandler.END
 
-    # Get OpenAI client
-    openai_client = context.bot_data.get('openai_client')
+    mode = query.data.split('_')[2]
+    logger.info(f"User {update.effective_user.id} selected quiz mode: {mode}")
 
-    # Generate question
-    prompt = get_quiz_prompt(topic, previous_questions)
-    response = await openai_client.generate_response(prompt)
+    context.user_data['quiz_mode'] = mode
+    context.user_data['state'] = 'quiz'
 
-    # Parse question and answer
+    # Generate first question
+    await generate_question(query.message, context, update.effective_user.id)
+
+    return QUIZ_ANSWER
+
+
+def parse_question(response: str) -> Dict[str, str]:
+    """Parse question and answer from ChatGPT response."""
     lines = response.strip().split('\n')
     question = ""
     answer = ""
@@ -120,18 +157,191 @@ async def generate_question(message, context: ContextTypes.DEFAULT_TYPE):
         elif line.startswith('Answer:'):
             answer = line.replace('Answer:', '').strip()
 
+    return {'question': question, 'answer': answer}
+
+
+def parse_choice_question(response: str) -> Dict:
+    """Parse a multiple-choice question, its options and the correct option."""
+    question = ""
+    options = []
+    correct_index = None
+
+    for line in response.strip().split('\n'):
+        line = line.strip()
+        option = re.match(r'^([A-D])[).:]\s*(.+)$', line)
+        if line.startswith('Question:'):
+            question = line.replace('Question:', '').strip()
+        elif line.startswith('Correct:'):
+            letter = line.replace('Correct:', '').strip()[:1].upper()
+            if letter and letter in 'ABCD':
+                correct_index = 'ABCD'.index(letter)
+        elif option:
+            options.append(option.group(2).strip())
+
+    if not question or len(options) < 2 or correct_index is None or correct_index >= len(options):
+        return {'question': question, 'answer': "", 'options': None, 'correct_index': None}
+
+    return {'question': question, 'answer': options[correct_index],
+            'options': options, 'correct_index': correct_index}
+
+
+async def fetch_question(db, openai_client, user_id: int, topic_id: str,
+                         previous_questions: list, shown_ids: list,
+                         multiple_choice: bool = False,
+                         priority: int = PRIORITY_STANDARD) -> Dict:
+    """Get a question the user hasn't seen, growing the shared bank if needed.
+
+    Raises UpstreamError if ChatGPT's replies can't be parsed into a question
+    with an answer.
+    """
+    stored = await db.get_unseen_quiz_question(user_id, topic_id, shown_ids,
+                                               multiple_choice=multiple_choice)
+    if stored:
+        return stored
+
+    # User has seen the whole bank for this topic, ask ChatGPT for a new question
+    known_questions = await db.get_recent_quiz_questions(topic_id, QUIZ_BANK_PROMPT_EXCLUDE)
+    excluded = list(dict.fromkeys(previous_questions + known_questions))
+    if multiple_choice:
+        prompt = get_quiz_choice_prompt(QUIZ_TOPICS[topic_id], excluded)
+        parse = parse_choice_question
+    else:
+        prompt = get_quiz_prompt(QUIZ_TOPICS[topic_id], excluded)
+        parse = parse_question
+
+    for attempt in range(QUIZ_GENERATION_ATTEMPTS):
+        response = await openai_client.generate_response(prompt, feature='quiz', priority=priority)
+        question = parse(response)
+        if question['question'] and question['answer']:
+            break
+        logger.warning(f"Unparseable {topic_id} quiz question (attempt {attempt + 1}): {response!r}")
+    else:
+        raise UpstreamError(f"No parseable {topic_id} quiz question "
+                            f"in {QUIZ_GENERATION_ATTEMPTS} attempts")
+
+    question['question_id'] = await db.add_quiz_question(
+        topic_id, question['question'], question['answer'],
+        question.get('options'), question.get('correct_index')
+    )
+    return question
+
+
+def start_question_prefetch(user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Start generating the next question while the user answers the current one."""
+    cancel_question_prefetch(user_id, context)
+
+    topic_id = context.user_data['quiz_topic']
+    mode = context.user_data.get('quiz_mode', 'text')
+    previous_questions = list(context.user_data.get('quiz_questions', []))
+    shown_ids = list(context.user_data.get('quiz_question_ids', []))
+    db = context.bot_data.get('database')
+    openai_client = context.bot_data.get('openai_client')
+
+    async def prefetch():
+        question = await fetch_question(db, openai_client, user_id, topic_id,
+                                        previous_questions, shown_ids,
+                                        multiple_choice=mode == 'choice',
+                                        priority=PRIORITY_PREFETCH)
+        # Discard the result if the user moved on in the meantime
+        if context.user_data.get('state') == 'quiz' and context.user_data.get('quiz_topic') == topic_id:
+            context.user_data['quiz_prefetched'] = {'topic': topic_id, 'mode': mode, **question}
+
+    task = asyncio.create_task(prefetch())
+    _prefetch_tasks[user_id] = task
+
+    def forget(finished: asyncio.Task):
+        if _prefetch_tasks.get(user_id) is finished:
+            del _prefetch_tasks[user_id]
+        if not finished.cancelled() and finished.exception():
+            logger.error(f"Question prefetch failed for user {user_id}: {finished.exception()}")
+
+    task.add_done_callback(forget)
+
+
+def cancel_question_prefetch(user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel an in-flight prefetch and drop any prefetched question."""
+    task = _prefetch_tasks.pop(user_id, None)
+    if task:
+        task.cancel()
+    context.user_data.pop('quiz_prefetched', None)
+
+
+async def generate_question(message, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    """Show the next quiz question, using the prefetched one when available."""
+    topic_id = context.user_data['quiz_topic']
+    mode = context.user_data.get('quiz_mode', 'text')
+    previous_questions = context.user_data.get('quiz_questions', [])
+    shown_ids = context.user_data.setdefault('quiz_question_ids', [])
+    db = context.bot_data.get('database')
+
+    # Wait for a prefetch that is still running rather than starting another request
+    task = _prefetch_tasks.get(user_id)
+    if task and 'quiz_prefetched' not in context.user_data:
+        await message.chat.send_action('typing')
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    prefetched = context.user_data.pop('quiz_prefetched', None)
+    if (prefetched and prefetched['topic'] == topic_id and prefetched['mode'] == mode
+            and prefetched['question']):
+        generated = prefetched
+    else:
+        # Send typing indicator
+        await message.chat.send_action('typing')
+
+        # Get OpenAI client
+        openai_client = context.bot_data.get('openai_client')
+
+        # Take a question from the bank or generate a new one
+        try:
+            generated = await fetch_question(db, openai_client, user_id, topic_id,
+                                             previous_questions, shown_ids,
+                                             multiple_choice=mode == 'choice')
+        except OpenAIUnavailable as e:
+            logger.error(f"Generating a quiz question failed: {e}")
+            await message.reply_text(e.user_message, reply_markup=get_quiz_continue_keyboard())
+            return
+
+    question = generated['question']
+    answer = generated['answer']
+
+    # Remember that the user has seen this question
+    if generated.get('question_id'):
+        shown_ids.append(generated['question_id'])
+        await db.mark_quiz_question_seen(user_id, generated['question_id'])
+
     # Save current question
     context.user_data['current_question'] = question
     context.user_data['current_answer'] = answer
     context.user_data['quiz_questions'].append(question)
+    question_seq = context.user_data.get('quiz_question_seq', 0) + 1
+    context.user_data['quiz_question_seq'] = question_seq
 
     # Send question
-    await message.reply_text(
-        f"❓ **Question {context.user_data['quiz_total'] + 1}**\n\n{question}\n\nType your answer:",
-        parse_mode='Markdown'
-    )
+    options = generated.get('options')
+    if mode == 'choice' and options:
+        context.user_data['current_options'] = options
+        context.user_data['current_correct_index'] = generated['correct_index']
+        option_lines = '\n'.join(f"{'ABCD'[i]}) {option}" for i, option in enumerate(options))
+        await message.reply_text(
+            f"❓ **Question {context.user_data['quiz_total'] + 1}**\n\n{question}\n\n{option_lines}",
+            reply_markup=get_quiz_options_keyboard(options, question_seq),
+            parse_mode='Markdown'
+        )
+    else:
+        context.user_data.pop('current_options', None)
+        await message.reply_text(
+            f"❓ **Question {context.user_data['quiz_total'] + 1}**\n\n{question}\n\nType your answer:",
+            parse_mode='Markdown'
+        )
 
+    # Prepare the next question in the background
+    start_question_prefetch(user_id, context)
 
+
+@serialized_per_user
 async def handle_quiz_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle quiz answer."""
     if context.user_data.get('state') != 'quiz':
@@ -141,43 +351,105 @@ async def handle_quiz_answer(update: Update, context: ContextTypes.DEFAULT_TYPE)
     correct_answer = context.user_data.get('current_answer')
     question = context.user_data.get('current_question')
 
+    # Each question is scored once, repeating an answer must not add to the rankings
+    if not correct_answer:
+        await update.message.reply_text("This question has already been answered.",
+                                        reply_markup=get_quiz_continue_keyboard())
+        return QUIZ_ANSWER
+
     logger.info(f"User {update.effective_user.id} answered: {user_answer}")
 
-    # Send typing indicator
-    await update.message.chat.send_action('typing')
+    # Decide obvious answers locally, ask ChatGPT only about ambiguous ones
+    verdict = check_answer(user_answer, correct_answer)
+    if verdict is True:
+        validation_stats['local_correct'] += 1
+        validation = f"Correct! The answer is {correct_answer}."
+    elif verdict is False:
+        validation_stats['local_incorrect'] += 1
+        validation = f"Incorrect. The correct answer is {correct_answer}."
+    else:
+        validation_stats['llm'] += 1
+
+        # Send typing indicator
+        await update.message.chat.send_action('typing')
+
+        # Get OpenAI client
+        openai_client = context.bot_data.get('openai_client')
+
+        # Validate answer
+        validation_prompt = get_quiz_validation_prompt(question, correct_answer, user_answer)
+        try:
+            validation = await openai_client.generate_response(validation_prompt,
+                                                             feature='quiz_check',
+                                                             priority=PRIORITY_INTERACTIVE,
+                                                             coalesce=True)
+        except OpenAIUnavailable as e:
+            # Leave the question open so the answer can be sent again
+            logger.error(f"Checking a quiz answer failed: {e}")
+            await update.message.reply_text(e.user_message)
+            return QUIZ_ANSWER
+
+    logger.debug(f"Quiz validations: {dict(validation_stats)}")
+
+    # Answering in text closes the question and any open options
+    context.user_data.pop('current_answer', None)
+    context.user_data.pop('current_options', None)
 
-    # Get OpenAI client
-    openai_client = context.bot_data.get('openai_client')
+    is_correct = validation.lower().startswith('correct')
+    result_emoji = "✅" if is_correct else "❌"
+    score, total, percentage = await record_answer(update.effective_user.id, context, is_correct)
 
-    # Validate answer
-    validation_prompt = get_quiz_validation_prompt(question, correct_answer, user_answer)
-    validation = await openai_client.generate_response(validation_prompt)
+    # Send result
+    await update.message.reply_text(
+        f"{result_emoji} {validation}\n\n"
+        f"📊 **Current Score:** {score}/{total} ({percentage:.1f}%)",
+        reply_markup=get_quiz_continue_keyboard(),
+        parse_mode='Markdown'
+    )
 
-    # Update score
-    context.user_data['quiz_total'] += 1
-    if validation.lower().startswith('correct'):
-        context.user_data['quiz_score'] += 1
-        result_emoji = "✅"
+    return QUIZ_ANSWER
+
+
+@serialized_per_user
+async def handle_quiz_option(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle a multiple-choice answer, checked locally."""
+    query = update.callback_query
+
+    # quiz_option_<question seq>_<option index>
+    parts = query.data.split('_')[2:]
+    question_seq, chosen = (int(part) for part in parts) if len(parts) == 2 else (None, -1)
+    options = context.user_data.get('current_options')
+    if (context.user_data.get('state') != 'quiz' or not options
+            or question_seq != context.user_data.get('quiz_question_seq')
+            or not 0 <= chosen < len(options)):
+        await query.answer("This question has already been answered.")
+        return QUIZ_ANSWER
+
+    await query.answer()
+    context.user_data.pop('current_options')
+    context.user_data.pop('current_answer', None)
+
+    correct_index = context.user_data.get('current_correct_index')
+    is_correct = chosen == correct_index
+
+    logger.info(f"User {update.effective_user.id} chose option {chosen}")
+
+    if is_correct:
+        result = f"✅ Correct! The answer is {options[correct_index]}."
     else:
-        result_emoji = "❌"
+        result = (f"❌ Incorrect. You chose {options[chosen]}, "
+                  f"the correct answer is {options[correct_index]}.")
 
-    # Get current stats
-    score = context.user_data['quiz_score']
-    total = context.user_data['quiz_total']
-    percentage = (score / total * 100) if total > 0 else 0
+    score, total, percentage = await record_answer(update.effective_user.id, context, is_correct)
 
-    # Save to database
-    db = context.bot_data.get('database')
-    await db.save_quiz_score(
-        update.effective_user.id,
-        context.user_data['quiz_topic'],
-        score,
-        total
-    )
+    # Remove the option buttons from the answered question
+    try:
+        await query.edit_message_reply_markup(reply_markup=None)
+    except Exception as e:
+        logger.debug(f"Could not remove quiz options: {e}")
 
-    # Send result
-    await update.message.reply_text(
-        f"{result_emoji} {validation}\n\n"
+    await query.message.reply_text(
+        f"{result}\n\n"
         f"📊 **Current Score:** {score}/{total} ({percentage:.1f}%)",
         reply_markup=get_quiz_continue_keyboard(),
         parse_mode='Markdown'
@@ -186,24 +458,49 @@ async def handle_quiz_answer(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return QUIZ_ANSWER
 
 
+async def record_answer(user_id: int, context: ContextTypes.DEFAULT_TYPE,
+                        is_correct: bool) -> tuple:
+    """Update and save the quiz score. Returns score, total and percentage."""
+    context.user_data['quiz_total'] += 1
+    if is_correct:
+        context.user_data['quiz_score'] += 1
+
+    score = context.user_data['quiz_score']
+    total = context.user_data['quiz_total']
+    percentage = (score / total * 100) if total > 0 else 0
+
+    # Save to database
+    db = context.bot_data.get('database')
+    topic_id = context.user_data['quiz_topic']
+    if not context.user_data.get('quiz_session_id'):
+        context.user_data['quiz_session_id'] = await db.start_quiz_session(user_id, topic_id)
+    await db.record_quiz_answer(context.user_data['quiz_session_id'], user_id, topic_id, is_correct)
+
+    return score, total, percentage
+
+
+@serialized_per_user
 async def next_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle next question button."""
     query = update.callback_query
     await query.answer()
 
-    await generate_question(query.message, context)
+    await generate_question(query.message, context, update.effective_user.id)
     return QUIZ_ANSWER
 
 
+@serialized_per_user
 async def change_topic(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle change topic button."""
     query = update.callback_query
     await query.answer()
 
     # Clear quiz state but keep scores
+    cancel_question_prefetch(update.effective_user.id, context)
     context.user_data.pop('state', None)
     context.user_data.pop('current_question', None)
     context.user_data.pop('current_answer', None)
+    context.user_data.pop('current_options', None)
 
     # Show topic selection
     await query.message.reply_text(
@@ -217,5 +514,6 @@ async def change_topic(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cancel_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel quiz conversation."""
+    cancel_question_prefetch(update.effective_user.id, context)
     context.user_data.pop('state', None)
     return ConversationHandler.END
\ No newline at end of file
@@ -1,11 +1,9 @@
 """Random fact command handler."""
 import logging
-import os
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.keyboards import get_random_fact_keyboard
-from utils.prompts import RANDOM_FACT_PROMPT
-from config import IMAGES
+from utils.resilience import OpenAIUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +12,14 @@ async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /random command."""
     logger.info(f"User {update.effective_user.id} requested random fact")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send initial message with image
     try:
-        if os.path.exists(IMAGES['random']):
-            message = await update.message.reply_photo(
-                photo=open(IMAGES['random'], 'rb'),
+        if media_cache.has_image('random'):
+            message = await media_cache.reply_photo(
+                update.message, 'random',
                 caption="🎲 Let me find an interesting fact for you..."
             )
         else:
@@ -31,11 +32,16 @@ async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🎲 Let me find an interesting fact for you..."
         )
 
-    # Get OpenAI client from context
-    openai_client = context.bot_data.get('openai_client')
+    # Get fact pool from context
+    fact_pool = context.bot_data.get('fact_pool')
 
-    # Generate random fact
-    fact = await openai_client.generate_response(RANDOM_FACT_PROMPT)
+    # Take a pre-generated random fact
+    try:
+        fact = await fact_pool.get()
+    except OpenAIUnavailable as e:
+        logger.error(f"Getting a random fact failed: {e}")
+        await message.reply_text(e.user_message, reply_markup=get_random_fact_keyboard())
+        return
 
     # Send the fact with keyboard
     await message.reply_text(
@@ -52,11 +58,14 @@ async def random_command_from_callback(update: Update, context: ContextTypes.DEF
 
     logger.info(f"User {query.from_user.id} requested random fact from button")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send initial message with image
     try:
-        if os.path.exists(IMAGES['random']):
-            message = await query.message.reply_photo(
-                photo=open(IMAGES['random'], 'rb'),
+        if media_cache.has_image('random'):
+            message = await media_cache.reply_photo(
+                query.message, 'random',
                 caption="🎲 Let me find an interesting fact for you..."
             )
         else:
@@ -69,11 +78,16 @@ async def random_command_from_callback(update: Update, context: ContextTypes.DEF
             "🎲 Let me find an interesting fact for you..."
         )
 
-    # Get OpenAI client from context
-    openai_client = context.bot_data.get('openai_client')
+    # Get fact pool from context
+    fact_pool = context.bot_data.get('fact_pool')
 
-    # Generate random fact
-    fact = await openai_client.generate_response(RANDOM_FACT_PROMPT)
+    # Take a pre-generated random fact
+    try:
+        fact = await fact_pool.get()
+    except OpenAIUnavailable as e:
+        logger.error(f"Getting a random fact failed: {e}")
+        await message.reply_text(e.user_message, reply_markup=get_random_fact_keyboard())
+        return
 
     # Send the fact with keyboard
     await message.reply_text(
@@ -90,14 +104,16 @@ async def another_fact_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
     logger.info(f"User {update.effective_user.id} requested another fact")
 
-    # Send loading message
-    await query.message.reply_text("🎲 Finding another interesting fact...")
-
-    # Get OpenAI client from context
-    openai_client = context.bot_data.get('openai_client')
+    # Get fact pool from context
+    fact_pool = context.bot_data.get('fact_pool')
 
-    # Generate another random fact
-    fact = await openai_client.generate_response(RANDOM_FACT_PROMPT)
+    # Take another pre-generated random fact
+    try:
+        fact = await fact_pool.get()
+    except OpenAIUnavailable as e:
+        logger.error(f"Getting a random fact failed: {e}")
+        await query.message.reply_text(e.user_message, reply_markup=get_random_fact_keyboard())
+        return
 
     # Send the fact with keyboard
     await query.message.reply_text(
@@ -1,13 +1,18 @@
 """Recommendation command handler."""
 import logging
-import os
 import re
+from typing import List, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.keyboards import (get_recommendation_category_keyboard,
                            get_genre_keyboard, get_recommendation_feedback_keyboard)
 from utils.prompts import get_recommendation_prompt
-from config import IMAGES, RECOMMENDATION_CATEGORIES
+from utils.exclusions import ExclusionList
+from utils.recommendation_pool import clean_title, renumber, split_recommendations
+from utils.resilience import OpenAIUnavailable
+from utils.user_locks import serialized_per_user
+from config import (RECOMMENDATION_CATEGORIES, RECOMMENDATION_COUNT,
+                    RECOMMENDATION_PROMPT_EXCLUDE, RECOMMENDATION_REFILL_ATTEMPTS)
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +21,14 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /recommend command."""
     logger.info(f"User {update.effective_user.id} started recommendations")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send category selection
     try:
-        if os.path.exists(IMAGES['recommend']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['recommend'], 'rb'),
+        if media_cache.has_image('recommend'):
+            await media_cache.reply_photo(
+                update.message, 'recommend',
                 caption="🎬📚 **Recommendations**\n\nWhat would you like recommendations for?",
                 reply_markup=get_recommendation_category_keyboard()
             )
@@ -46,11 +54,14 @@ async def recommend_command_from_callback(update: Update, context: ContextTypes.
 
     logger.info(f"User {query.from_user.id} started recommendations from button")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send category selection
     try:
-        if os.path.exists(IMAGES['recommend']):
-            await query.message.reply_photo(
-                photo=open(IMAGES['recommend'], 'rb'),
+        if media_cache.has_image('recommend'):
+            await media_cache.reply_photo(
+                query.message, 'recommend',
                 caption="🎬📚 **Recommendations**\n\nWhat would you like recommendations for?",
                 reply_markup=get_recommendation_category_keyboard()
             )
@@ -69,6 +80,7 @@ async def recommend_command_from_callback(update: Update, context: ContextTypes.
         )
 
 
+@serialized_per_user
 async def category_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle category selection."""
     query = update.callback_query
@@ -91,6 +103,7 @@ async def category_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@serialized_per_user
 async def genre_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle genre selection."""
     query = update.callback_query
@@ -109,21 +122,14 @@ async def genre_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Send typing indicator
     await query.message.chat.send_action('typing')
 
-    # Get database and check for disliked items
-    db = context.bot_data.get('database')
-    disliked_items = await db.get_disliked_recommendations(
-        update.effective_user.id, category
-    )
-
-    # Get OpenAI client
-    openai_client = context.bot_data.get('openai_client')
-
     # Generate recommendations
-    prompt = get_recommendation_prompt(category, genre, disliked_items)
-    recommendations = await openai_client.generate_response(prompt)
-
-    # Extract item names for tracking
-    current_items = extract_item_names(recommendations)
+    try:
+        recommendations, current_items = await generate_recommendations(
+            context, update.effective_user.id, category, genre
+        )
+    except OpenAIUnavailable as e:
+        logger.error(f"Generating recommendations failed: {e}")
+        recommendations, current_items = e.user_message, []
     context.user_data['current_recommendations'] = current_items
 
     # Add to shown recommendations
@@ -138,6 +144,7 @@ async def genre_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@serialized_per_user
 async def handle_dislike(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle dislike button."""
     query = update.callback_query
@@ -148,10 +155,9 @@ async def handle_dislike(update: Update, context: ContextTypes.DEFAULT_TYPE):
     category = context.user_data.get('rec_category')
     current_recs = context.user_data.get('current_recommendations', [])
 
-    for item in current_recs:
-        await db.save_recommendation(
-            update.effective_user.id, category, item, liked=False
-        )
+    await db.save_recommendations(
+        update.effective_user.id, category, current_recs, liked=False
+    )
 
     # Generate new recommendations
     await get_more_recommendations(query, context)
@@ -166,27 +172,14 @@ async def get_more_recommendations(query, context: ContextTypes.DEFAULT_TYPE):
     # Send typing indicator
     await query.message.chat.send_action('typing')
 
-    # Get database and check for disliked items
-    db = context.bot_data.get('database')
-    disliked_items = await db.get_disliked_recommendations(
-        query.from_user.id, category
-    )
-
-    # Get all previous shown recommendations
-    shown_items = context.user_data.get('shown_recommendations', [])
-
-    # Combine disliked and already shown items to avoid repetitions
-    all_excluded_items = list(set(disliked_items + shown_items))
-
-    # Get OpenAI client
-    openai_client = context.bot_data.get('openai_client')
-
     # Generate new recommendations
-    prompt = get_recommendation_prompt(category, genre, all_excluded_items)
-    recommendations = await openai_client.generate_response(prompt)
-
-    # Extract item names for tracking
-    current_items = extract_item_names(recommendations)
+    try:
+        recommendations, current_items = await generate_recommendations(
+            context, query.from_user.id, category, genre
+        )
+    except OpenAIUnavailable as e:
+        logger.error(f"Generating recommendations failed: {e}")
+        recommendations, current_items = e.user_message, []
     context.user_data['current_recommendations'] = current_items
     context.user_data['shown_recommendations'].extend(current_items)
 
@@ -199,6 +192,78 @@ async def get_more_recommendations(query, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def generate_recommendations(context: ContextTypes.DEFAULT_TYPE, user_id: int,
+                                   category: str, genre: str) -> Tuple[str, List[str]]:
+    """Generate a page of recommendations without repeating excluded titles.
+
+    Unseen candidates come from the shared pool, OpenAI is only asked for
+    the slots the pool can't fill. Only the most relevant exclusions go into
+    the prompt. Repeats the model returns anyway are dropped here, and only
+    their slots are requested again.
+    """
+    # Dislikes are read once per session and then served from memory
+    db = context.bot_data.get('database')
+    disliked_items = await db.get_disliked_recommendations(user_id, category)
+    shown_items = context.user_data.get('shown_recommendations', [])
+    exclusions = ExclusionList.for_user(disliked_items, shown_items)
+
+    # Serve unseen candidates from the shared pool first
+    picks = []
+    pool = context.bot_data.get('recommendation_pool')
+    if pool:
+        cursors = context.user_data.setdefault('rec_pool_cursors', {})
+        pool_key = f"{category}:{genre}"
+        picks, cursors[pool_key] = pool.take(category, genre, cursors.get(pool_key, 0),
+                                             exclusions, RECOMMENDATION_COUNT)
+
+    # Get OpenAI client
+    openai_client = context.bot_data.get('openai_client')
+
+    intro = None
+    attempts = RECOMMENDATION_REFILL_ATTEMPTS + 1
+    while len(picks) < RECOMMENDATION_COUNT and attempts:
+        attempts -= 1
+        missing = RECOMMENDATION_COUNT - len(picks)
+        prompt = get_recommendation_prompt(
+            category, genre, exclusions.most_relevant(RECOMMENDATION_PROMPT_EXCLUDE), missing
+        )
+        # The first page is shared while nothing is excluded
+        try:
+            recommendations = await openai_client.generate_response(
+                prompt, feature='recommend', coalesce=True, cache=not exclusions
+            )
+        except OpenAIUnavailable:
+            if not picks:
+                raise
+            break
+
+        head, items = split_recommendations(recommendations)
+        if not items:
+            break
+
+        if intro is None and not picks:
+            intro = head
+        repeats = 0
+        for title, block in items:
+            if len(picks) == RECOMMENDATION_COUNT:
+                break
+            if exclusions.add(title):
+                picks.append((title, block))
+            else:
+                repeats += 1
+        if repeats:
+            logger.info(f"Dropped {repeats} repeated recommendations for user {user_id}")
+
+    if not picks:
+        # Not in the expected format or nothing new, show the response as it is
+        return recommendations, extract_item_names(recommendations)
+
+    blocks = [renumber(block, number) for number, (_, block) in enumerate(picks, start=1)]
+    text = "\n\n".join([intro] + blocks if intro else blocks)
+    return text, [title for title, _ in picks]
+
+
+@serialized_per_user
 async def handle_more_recommendations(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle more recommendations button."""
     query = update.callback_query
@@ -207,6 +272,7 @@ async def handle_more_recommendations(update: Update, context: ContextTypes.DEFA
     await get_more_recommendations(query, context)
 
 
+@serialized_per_user
 async def recommendation_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle back button in recommendations."""
     query = update.callback_query
@@ -236,7 +302,6 @@ def extract_item_names(recommendations: str) -> list:
         # Clean up the match and check if it looks like a title
         if len(match) > 3 and not match.startswith('Recommendations'):
             # Remove year in parentheses for movies
-            clean_title = re.sub(r'\s*\([0-9]{4}\)\s*', '', match)
-            items.append(clean_title.strip())
+            items.append(clean_title(match))
 
-    return items[:3]
\ No newline at end of file
+    return items[:RECOMMENDATION_COUNT]
\ No newline at end of file
@@ -1,10 +1,9 @@
 """Start command handler."""
 import logging
-import os
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.keyboards import get_start_keyboard
-from config import IMAGES
+from handlers.quiz import cancel_question_prefetch
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +30,17 @@ Choose an option below or use the commands:
 /talk - Talk to a personality
 /quiz - Start a quiz
 /translate - Translator
-/recommend - Get recommendations"""
+/recommend - Get recommendations
+/leaderboard - Quiz leaderboard"""
+
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
 
     # Try to send with image, fallback to text only
     try:
-        if os.path.exists(IMAGES['start']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['start'], 'rb'),
+        if media_cache.has_image('start'):
+            await media_cache.reply_photo(
+                update.message, 'start',
                 caption=welcome_text,
                 reply_markup=get_start_keyboard()
             )
@@ -60,6 +63,7 @@ async def finish_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     # Clear any ongoing conversation states
+    cancel_question_prefetch(update.effective_user.id, context)
     context.user_data.clear()
 
     # Send start menu
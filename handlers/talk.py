@@ -1,12 +1,15 @@
 """Talk to personality command handler."""
 import logging
-import os
-import json
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.keyboards import get_personalities_keyboard, get_talk_finish_keyboard
 from utils.prompts import PERSONALITY_PROMPTS
-from config import IMAGES, PERSONALITIES
+from utils.streaming import stream_reply
+from utils.history import build_messages, load_history, add_turn, start_summary
+from utils.rate_limiter import PRIORITY_INTERACTIVE
+from utils.resilience import OpenAIUnavailable
+from utils.user_locks import serialized_per_user
+from config import PERSONALITIES, TALK_HISTORY_LOAD_LIMIT
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +21,14 @@ async def talk_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /talk command."""
     logger.info(f"User {update.effective_user.id} started talk feature")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send personality selection
     try:
-        if os.path.exists(IMAGES['talk']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['talk'], 'rb'),
+        if media_cache.has_image('talk'):
+            await media_cache.reply_photo(
+                update.message, 'talk',
                 caption="💬 **Talk to a Historical Figure**\n\nChoose a personality to chat with:",
                 reply_markup=get_personalities_keyboard()
             )
@@ -48,11 +54,14 @@ async def talk_command_from_callback(update: Update, context: ContextTypes.DEFAU
 
     logger.info(f"User {query.from_user.id} started talk feature from button")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send personality selection
     try:
-        if os.path.exists(IMAGES['talk']):
-            await query.message.reply_photo(
-                photo=open(IMAGES['talk'], 'rb'),
+        if media_cache.has_image('talk'):
+            await media_cache.reply_photo(
+                query.message, 'talk',
                 caption="💬 **Talk to a Historical Figure**\n\nChoose a personality to chat with:",
                 reply_markup=get_personalities_keyboard()
             )
@@ -86,20 +95,26 @@ async def personality_selected(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data['personality_name'] = personality_name
     context.user_data['state'] = 'talk_chat'
     context.user_data['conversation_history'] = []
+    context.user_data['summary_pending'] = []
+    context.user_data.pop('summary_backlog', None)
+    context.user_data['conversation_summary'] = None
+    context.user_data['conversation_seq'] = 0
 
     # Get database from context
     db = context.bot_data.get('database')
 
     # Check for existing conversation
-    existing = await db.get_conversation_context(update.effective_user.id)
+    existing = await db.get_conversation(update.effective_user.id, TALK_HISTORY_LOAD_LIMIT)
     if existing and existing['personality'] == personality_id:
-        context.user_data['conversation_history'] = json.loads(existing['context'])
+        load_history(context.user_data, existing)
+        start_summary(update.effective_user.id, context)
         await query.message.reply_text(
             f"📜 Continuing your conversation with **{personality_name}**...\n\nType your message:",
             reply_markup=get_talk_finish_keyboard(),
             parse_mode='Markdown'
         )
     else:
+        await db.start_conversation(update.effective_user.id, personality_id)
         await query.message.reply_text(
             f"🎭 You're now talking to **{personality_name}**!\n\nType your message:",
             reply_markup=get_talk_finish_keyboard(),
@@ -109,6 +124,7 @@ async def personality_selected(update: Update, context: ContextTypes.DEFAULT_TYP
     return TALK_CHAT
 
 
+@serialized_per_user
 async def handle_talk_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle messages in talk chat state."""
     if context.user_data.get('state') != 'talk_chat':
@@ -120,48 +136,27 @@ async def handle_talk_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     logger.info(f"User {update.effective_user.id} talking to {personality_name}")
 
-    # Send typing indicator
-    await update.message.chat.send_action('typing')
-
     # Get OpenAI client from context
     openai_client = context.bot_data.get('openai_client')
 
-    # Build conversation history
-    messages = [
-        {"role": "system", "content": PERSONALITY_PROMPTS[personality_id]}
-    ]
-
-    # Add conversation history
-    for msg in context.user_data.get('conversation_history', []):
-        messages.append(msg)
-
-    # Add current message
-    messages.append({"role": "user", "content": user_message})
-
-    # Generate response
-    response = await openai_client.generate_conversation_response(messages)
-
-    # Update conversation history
-    context.user_data['conversation_history'].append({"role": "user", "content": user_message})
-    context.user_data['conversation_history'].append({"role": "assistant", "content": response})
+    # Build prompt from the summary and the history that fits the token budget
+    messages = build_messages(PERSONALITY_PROMPTS[personality_id], context.user_data, user_message)
 
-    # Keep only last 10 exchanges
-    if len(context.user_data['conversation_history']) > 20:
-        context.user_data['conversation_history'] = context.user_data['conversation_history'][-20:]
-
-    # Save to database
-    db = context.bot_data.get('database')
-    await db.save_conversation_context(
-        update.effective_user.id,
-        personality_id,
-        json.dumps(context.user_data['conversation_history'])
-    )
+    # Stream response into a message, failures are shown in it
+    try:
+        response = await stream_reply(
+            update.message,
+            openai_client.stream_conversation_response(messages, feature='talk',
+                                                       priority=PRIORITY_INTERACTIVE),
+            reply_markup=get_talk_finish_keyboard()
+        )
+    except OpenAIUnavailable:
+        # Keep failed turns out of the history
+        return TALK_CHAT
 
-    # Send response
-    await update.message.reply_text(
-        response,
-        reply_markup=get_talk_finish_keyboard()
-    )
+    # Save the turn and summarise history that no longer fits
+    await add_turn(update.effective_user.id, context, user_message, response)
+    start_summary(update.effective_user.id, context)
 
     return TALK_CHAT
 
@@ -1,11 +1,12 @@
 """Translator command handler."""
 import logging
-import os
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.keyboards import get_language_keyboard, get_translate_continue_keyboard
 from utils.prompts import get_translation_prompt, get_auto_translation_prompt
-from config import IMAGES, LANGUAGES
+from utils.rate_limiter import PRIORITY_INTERACTIVE
+from utils.resilience import OpenAIUnavailable
+from config import LANGUAGES
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +18,14 @@ async def translate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /translate command."""
     logger.info(f"User {update.effective_user.id} started translator")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send language selection
     try:
-        if os.path.exists(IMAGES['translate']):
-            await update.message.reply_photo(
-                photo=open(IMAGES['translate'], 'rb'),
+        if media_cache.has_image('translate'):
+            await media_cache.reply_photo(
+                update.message, 'translate',
                 caption="🌐 **Translator**\n\nChoose translation mode:",
                 reply_markup=get_language_keyboard()
             )
@@ -47,11 +51,14 @@ async def translate_command_from_callback(update: Update, context: ContextTypes.
 
     logger.info(f"User {query.from_user.id} started translator from button")
 
+    # Get media cache from context
+    media_cache = context.bot_data.get('media_cache')
+
     # Send language selection
     try:
-        if os.path.exists(IMAGES['translate']):
-            await query.message.reply_photo(
-                photo=open(IMAGES['translate'], 'rb'),
+        if media_cache.has_image('translate'):
+            await media_cache.reply_photo(
+                query.message, 'translate',
                 caption="🌐 **Translator**\n\nChoose translation mode:",
                 reply_markup=get_language_keyboard()
             )
@@ -118,9 +125,30 @@ async def handle_translation(update: Update, context: ContextTypes.DEFAULT_TYPE)
     openai_client = context.bot_data.get('openai_client')
 
     # Generate translation
+    try:
+        result = await translate(openai_client, text_to_translate, mode,
+                                 context.user_data.get('target_language'))
+    except OpenAIUnavailable as e:
+        logger.error(f"Translation failed: {e}")
+        result = e.user_message
+
+    # Send translation
+    await update.message.reply_text(
+        result,
+        reply_markup=get_translate_continue_keyboard(),
+        parse_mode='Markdown'
+    )
+
+    return TRANSLATE_TEXT
+
+
+async def translate(openai_client, text_to_translate: str, mode: str, target_lang: str) -> str:
+    """Translate text and format the result."""
     if mode == 'auto':
         prompt = get_auto_translation_prompt(text_to_translate)
-        response = await openai_client.generate_response(prompt)
+        response = await openai_client.generate_response(prompt, feature='translate',
+                                                         priority=PRIORITY_INTERACTIVE,
+                                                         coalesce=True, cache=True)
 
         # Parse response
         lines = response.strip().split('\n')
@@ -136,21 +164,13 @@ async def handle_translation(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if not translation:
             translation = response  # Fallback if parsing fails
 
-        result = f"🔍 **Detected:** {detected_lang}\n\n📝 **Translation:**\n{translation}"
-    else:
-        target_lang = context.user_data.get('target_language')
-        prompt = get_translation_prompt(text_to_translate, target_lang)
-        translation = await openai_client.generate_response(prompt)
-        result = f"📝 **Translation to {target_lang}:**\n\n{translation}"
+        return f"🔍 **Detected:** {detected_lang}\n\n📝 **Translation:**\n{translation}"
 
-    # Send translation
-    await update.message.reply_text(
-        result,
-        reply_markup=get_translate_continue_keyboard(),
-        parse_mode='Markdown'
-    )
-
-    return TRANSLATE_TEXT
+    prompt = get_translation_prompt(text_to_translate, target_lang)
+    translation = await openai_client.generate_response(prompt, feature='translate',
+                                                        priority=PRIORITY_INTERACTIVE,
+                                                        coalesce=True, cache=True)
+    return f"📝 **Translation to {target_lang}:**\n\n{translation}"
 
 
 async def change_translation_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -3,12 +3,21 @@ import logging
 import asyncio
 from telegram import Update
 from telegram.ext import (Application, CommandHandler, MessageHandler,
-                         CallbackQueryHandler, ConversationHandler, filters)
+                         CallbackQueryHandler, ConversationHandler, PersistenceInput, filters)
 from warnings import filterwarnings
 from telegram.warnings import PTBUserWarning
-from config import TELEGRAM_BOT_TOKEN
+from config import (TELEGRAM_BOT_TOKEN, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN,
+                    WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, CONCURRENT_UPDATES)
 from database import Database
 from openai_client import OpenAIClient
+from utils.assets import AssetStore
+from utils.fact_pool import FactPool
+from utils.media import MediaCache
+from utils.persistence import SQLitePersistence
+from utils.recommendation_pool import RecommendationPool
+from utils.response_cache import ResponseCache
+from utils.update_processor import ChatOrderedUpdateProcessor
+from utils.user_locks import UserLocks
 
 # Import handlers
 from handlers.start import start_command, finish_callback
@@ -20,11 +29,13 @@ from handlers.talk import (talk_command, talk_command_from_callback,
                           personality_selected, handle_talk_message,
                           change_personality, cancel_talk, TALK_CHAT)
 from handlers.quiz import (quiz_command, quiz_command_from_callback,
-                          topic_selected, handle_quiz_answer,
-                          next_question, change_topic, cancel_quiz, QUIZ_ANSWER)
+                          topic_selected, mode_selected, handle_quiz_answer,
+                          handle_quiz_option, next_question, change_topic,
+                          cancel_quiz, QUIZ_ANSWER)
 from handlers.translate import (translate_command, translate_command_from_callback,
                                translation_mode_selected, handle_translation,
                                change_translation_mode, cancel_translate, TRANSLATE_TEXT)
+from handlers.leaderboard import leaderboard_command, leaderboard_callback
 from handlers.recommend import (recommend_command, recommend_command_from_callback,
                                category_selected, genre_selected, handle_dislike,
                                handle_more_recommendations, recommendation_back)
@@ -38,25 +49,90 @@ logger = logging.getLogger(__name__)
 
 async def post_init(application: Application) -> None:
     """Initialize bot data after startup."""
-    # Initialize database
-    db = Database()
+    # Initialize database (persistence has usually opened it already)
+    db = application.persistence.db
     await db.initialize()
     application.bot_data['database'] = db
 
-    # Initialize OpenAI client
-    openai_client = OpenAIClient()
+    # Load and optimise bot images once
+    assets = AssetStore()
+    await asyncio.to_thread(assets.load)
+
+    # Initialize media cache
+    media_cache = MediaCache(db, assets)
+    await media_cache.load()
+    application.bot_data['media_cache'] = media_cache
+
+    # Per-user locks for handlers that modify user_data across awaits
+    application.bot_data['user_locks'] = UserLocks()
+
+    # Initialize OpenAI client with its response cache
+    response_cache = ResponseCache(db)
+    await response_cache.prune()
+    openai_client = OpenAIClient(response_cache)
     application.bot_data['openai_client'] = openai_client
 
+    # Start random fact pool
+    fact_pool = FactPool(openai_client, db)
+    await fact_pool.start()
+    application.bot_data['fact_pool'] = fact_pool
+
+    # Load shared recommendation candidates
+    recommendation_pool = RecommendationPool(openai_client, db)
+    await recommendation_pool.start()
+    application.bot_data['recommendation_pool'] = recommendation_pool
+
     logger.info("Bot initialization complete")
 
 
+async def post_shutdown(application: Application) -> None:
+    """Release resources on shutdown."""
+    openai_client = application.bot_data.get('openai_client')
+    if openai_client:
+        logger.info(f"OpenAI client stats: {openai_client.stats()}")
+        await openai_client.response_cache.stop()
+
+    user_locks = application.bot_data.get('user_locks')
+    if user_locks:
+        logger.info(f"User lock stats: {user_locks.stats()}")
+
+    fact_pool = application.bot_data.get('fact_pool')
+    if fact_pool:
+        await fact_pool.stop()
+
+    recommendation_pool = application.bot_data.get('recommendation_pool')
+    if recommendation_pool:
+        logger.info(f"Recommendation pool stats: {recommendation_pool.stats()}")
+        await recommendation_pool.stop()
+
+    db = application.bot_data.get('database')
+    if db:
+        await db.close()
+
+
 def main():
     """Start the bot."""
+    if BOT_MODE not in ('polling', 'webhook'):
+        raise SystemExit(f"BOT_MODE must be 'polling' or 'webhook', not {BOT_MODE!r}")
+    if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+        raise SystemExit("WEBHOOK_URL must be set to the bot's public HTTPS URL "
+                         "when BOT_MODE=webhook")
+
+    # Persist user data and conversation states in the bot database. bot_data
+    # only holds services that post_init recreates, so it isn't stored.
+    persistence = SQLitePersistence(
+        Database(), store_data=PersistenceInput(bot_data=False, callback_data=False)
+    )
+
     # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN).persistence(persistence)
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES))
+    application = builder.build()
 
-    # Add post-init callback
+    # Add post-init and post-shutdown callbacks
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -78,6 +154,8 @@ def main():
             CommandHandler("cancel", cancel_gpt),
             CallbackQueryHandler(finish_callback, pattern="^finish$")
         ],
+        name="gpt",
+        persistent=True
     )
     application.add_handler(gpt_handler)
 
@@ -98,7 +176,9 @@ def main():
         fallbacks=[
             CommandHandler("cancel", cancel_talk),
             CallbackQueryHandler(finish_callback, pattern="^finish$")
-        ]
+        ],
+        name="talk",
+        persistent=True
     )
     application.add_handler(talk_handler)
 
@@ -107,11 +187,14 @@ def main():
         entry_points=[
             CommandHandler("quiz", quiz_command),
             CallbackQueryHandler(quiz_command_from_callback, pattern="^cmd_quiz$"),
-            CallbackQueryHandler(topic_selected, pattern="^quiz_topic_")
+            CallbackQueryHandler(topic_selected, pattern="^quiz_topic_"),
+            CallbackQueryHandler(mode_selected, pattern="^quiz_mode_")
         ],
         states={
             QUIZ_ANSWER: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_quiz_answer),
+                CallbackQueryHandler(handle_quiz_option, pattern=r"^quiz_option_\d+(_\d+)?$"),
+                CallbackQueryHandler(mode_selected, pattern="^quiz_mode_"),
                 CallbackQueryHandler(next_question, pattern="^quiz_next$"),
                 CallbackQueryHandler(change_topic, pattern="^quiz_change_topic$"),
                 CallbackQueryHandler(finish_callback, pattern="^finish$")
@@ -120,7 +203,9 @@ def main():
         fallbacks=[
             CommandHandler("cancel", cancel_quiz),
             CallbackQueryHandler(finish_callback, pattern="^finish$")
-        ]
+        ],
+        name="quiz",
+        persistent=True
     )
     application.add_handler(quiz_handler)
 
@@ -141,18 +226,22 @@ def main():
         fallbacks=[
             CommandHandler("cancel", cancel_translate),
             CallbackQueryHandler(finish_callback, pattern="^finish$")
-        ]
+        ],
+        name="translate",
+        persistent=True
     )
     application.add_handler(translate_handler)
 
     # Recommendation handlers
     application.add_handler(CommandHandler("recommend", recommend_command))
+    application.add_handler(CommandHandler("leaderboard", leaderboard_command))
     application.add_handler(CallbackQueryHandler(recommend_command_from_callback, pattern="^cmd_recommend$"))
 
     # Callback query handlers
     application.add_handler(CallbackQueryHandler(random_command_from_callback, pattern="^cmd_random$"))
     application.add_handler(CallbackQueryHandler(finish_callback, pattern="^finish$"))
     application.add_handler(CallbackQueryHandler(another_fact_callback, pattern="^another_fact$"))
+    application.add_handler(CallbackQueryHandler(leaderboard_callback, pattern="^leaderboard_"))
 
     # Recommendation callbacks
     application.add_handler(CallbackQueryHandler(category_selected, pattern="^rec_cat_"))
@@ -161,9 +250,20 @@ def main():
     application.add_handler(CallbackQueryHandler(handle_more_recommendations, pattern="^rec_more$"))
     application.add_handler(CallbackQueryHandler(recommendation_back, pattern="^rec_back$"))
 
-    # Start polling
-    logger.info("Starting bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Start serving updates
+    if BOT_MODE == 'webhook':
+        logger.info(f"Starting bot with webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}...")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        logger.info("Starting bot...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == '__main__':
@@ -1,57 +1,292 @@
 """OpenAI API client wrapper."""
+import asyncio
 import logging
-from typing import List, Dict, Optional
-from openai import AsyncOpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL, MAX_TOKENS, TEMPERATURE
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIError, APIStatusError, RateLimitError
+from utils.hedging import Hedger
+from utils.rate_limiter import RateLimiter, PRIORITY_STANDARD, estimate_tokens
+from utils.resilience import (CircuitBreaker, Deadline, DeadlineExceeded, UpstreamError,
+                              backoff_delay)
+from utils.response_cache import cache_key
+from config import (OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, MAX_TOKENS, TEMPERATURE,
+                    OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, OPENAI_DEADLINES,
+                    OPENAI_DEFAULT_DEADLINE, OPENAI_MAX_RETRIES, OPENAI_RETRY_BASE_DELAY,
+                    OPENAI_RETRY_MAX_DELAY, OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RESET)
 
 logger = logging.getLogger(__name__)
 
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed request may succeed when sent again."""
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        # Includes timeouts
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
 class OpenAIClient:
-    """Async OpenAI API client."""
+    """Async OpenAI API client.
+
+    Requests fail with an OpenAIUnavailable subclass from utils.resilience
+    when no response can be produced within the feature's deadline.
+    """
 
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, response_cache=None):
+        # Retries are ours, so they can respect the deadline and the circuit breaker
+        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+                                  max_retries=0)
         self.model = OPENAI_MODEL
+        self.rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+        self.breaker = CircuitBreaker(OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RESET)
+        self.hedger = Hedger()
+        self.errors = Counter()
+
+        # Identical prompts in flight, shared by callers that opt in
+        self._in_flight: Dict[Tuple, asyncio.Task] = {}
+        self.coalesce_stats = Counter()
+
+        self.response_cache = response_cache
+
+    @staticmethod
+    def _build_messages(prompt: str,
+                        system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """Build a single-turn message list."""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _deadline(feature: str) -> Deadline:
+        return Deadline(OPENAI_DEADLINES.get(feature, OPENAI_DEFAULT_DEADLINE))
+
+    async def _create(self, messages: List[Dict[str, str]], temperature: float,
+                      max_tokens: int, priority: int, feature: str, stream: bool = False,
+                      deadline: Optional[Deadline] = None):
+        """Send a chat completion request within the feature's deadline.
+
+        Transient failures are retried with jittered exponential backoff as
+        long as the deadline allows. Returns the parsed response and the
+        number of tokens reserved for it.
+        """
+        deadline = deadline or self._deadline(feature)
+        tokens = estimate_tokens(messages) + max_tokens
+        attempt = 0
+        while True:
+            self.breaker.check()
+            try:
+                await asyncio.wait_for(self.rate_limiter.acquire(priority, tokens),
+                                       deadline.remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{feature} request still queued at its deadline")
+
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=stream,
+                    timeout=deadline.remaining(),
+                )
+            except APIError as e:
+                self.errors[type(e).__name__] += 1
+                if isinstance(e, RateLimitError):
+                    delay = self.rate_limiter.retry_delay(e.response.headers)
+                    self.rate_limiter.backoff(delay)
+                elif is_transient(e):
+                    self.breaker.failure()
+                    delay = backoff_delay(attempt, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY)
+                else:
+                    raise UpstreamError(f"{feature} request rejected: {e}") from e
+
+                if attempt == OPENAI_MAX_RETRIES:
+                    raise UpstreamError(f"{feature} request failed {attempt + 1} times: {e}") from e
+                if delay >= deadline.remaining():
+                    raise DeadlineExceeded(f"{feature} request failed with no time left "
+                                           f"to retry: {e}") from e
+                attempt += 1
+                logger.warning(f"OpenAI {feature} request failed ({e}), "
+                               f"retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.success()
+            self.rate_limiter.update_from_headers(raw.headers)
+            return raw.parse(), tokens
+
+    def _refund_unused(self, response, tokens: int):
+        """Give back the part of the token reservation a response didn't use."""
+        if getattr(response, 'usage', None):
+            self.rate_limiter.refund(tokens - response.usage.total_tokens)
 
     async def generate_response(self, prompt: str,
                                 system_prompt: Optional[str] = None,
                                 temperature: float = TEMPERATURE,
-                                max_tokens: int = MAX_TOKENS) -> str:
-        """Generate a response from ChatGPT."""
-        try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
+                                max_tokens: int = MAX_TOKENS,
+                                feature: str = 'default',
+                                priority: int = PRIORITY_STANDARD,
+                                coalesce: bool = False,
+                                cache: bool = False) -> str:
+        """Generate a response from ChatGPT.
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+        With coalesce=True, concurrent calls with the same prompt share a
+        single upstream request. With cache=True, repeated prompts are served
+        from the response cache with the feature's TTL; leave it unset for
+        calls whose answer should vary.
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        key = (self.model, system_prompt, prompt, temperature, max_tokens)
 
-            return response.choices[0].message.content.strip()
+        stored_key = None
+        if cache and self.response_cache:
+            stored_key = cache_key(*key)
+            cached = await self.response_cache.get(feature, stored_key)
+            if cached is not None:
+                return cached
 
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return "I apologize, but I have encountered an error. Please try again later."
+        if coalesce:
+            response = await self._coalesced(key, messages, temperature, max_tokens,
+                                             feature, priority)
+        else:
+            response = await self.generate_conversation_response(messages, temperature,
+                                                                 max_tokens, feature, priority)
+
+        if stored_key:
+            await self.response_cache.put(feature, stored_key, response)
+        return response
+
+    async def _coalesced(self, key: Tuple, messages: List[Dict[str, str]], temperature: float,
+                         max_tokens: int, feature: str, priority: int) -> str:
+        """Share one upstream request between concurrent identical calls."""
+        task = self._in_flight.get(key)
+        if task:
+            self.coalesce_stats['hits'] += 1
+        else:
+            self.coalesce_stats['misses'] += 1
+            task = asyncio.create_task(self.generate_conversation_response(
+                messages, temperature, max_tokens, feature, priority))
+            self._in_flight[key] = task
+
+            def forget(finished: asyncio.Task):
+                if self._in_flight.get(key) is finished:
+                    del self._in_flight[key]
+                # Every waiter may have given up, don't warn about an unretrieved error
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(forget)
+
+        # Shielded so one caller giving up doesn't cancel the others' request
+        return await asyncio.shield(task)
 
     async def generate_conversation_response(self,
                                              messages: List[Dict[str, str]],
                                              temperature: float = TEMPERATURE,
-                                             max_tokens: int = MAX_TOKENS) -> str:
+                                             max_tokens: int = MAX_TOKENS,
+                                             feature: str = 'default',
+                                             priority: int = PRIORITY_STANDARD) -> str:
         """Generate a response for ongoing conversation."""
+        # A hedge shares the deadline of the original request
+        deadline = self._deadline(feature)
+        response, tokens = await self.hedger.run(
+            feature,
+            lambda: self._create(messages, temperature, max_tokens, priority, feature,
+                                 deadline=deadline),
+            allowed=self.breaker.state == 'closed'
+        )
+        self._refund_unused(response, tokens)
+
+        content = response.choices[0].message.content if response.choices else None
+        if not content:
+            self.errors['EmptyResponse'] += 1
+            raise UpstreamError(f"{feature} request returned no content")
+        return content.strip()
+
+    async def stream_response(self, prompt: str,
+                              system_prompt: Optional[str] = None,
+                              temperature: float = TEMPERATURE,
+                              max_tokens: int = MAX_TOKENS,
+                              feature: str = 'default',
+                              priority: int = PRIORITY_STANDARD) -> AsyncIterator[str]:
+        """Stream a response from ChatGPT as text deltas."""
+        messages = self._build_messages(prompt, system_prompt)
+        async for delta in self.stream_conversation_response(messages, temperature,
+                                                             max_tokens, feature, priority):
+            yield delta
+
+    async def stream_conversation_response(self,
+                                           messages: List[Dict[str, str]],
+                                           temperature: float = TEMPERATURE,
+                                           max_tokens: int = MAX_TOKENS,
+                                           feature: str = 'default',
+                                           priority: int = PRIORITY_STANDARD) -> AsyncIterator[str]:
+        """Stream a response for ongoing conversation as text deltas.
+
+        Hedging races streams to their first delta.
+        """
+        deadline = self._deadline(feature)
+        stream, first_delta = await self.hedger.run(
+            feature,
+            lambda: self._open_stream(messages, temperature, max_tokens, priority, feature,
+                                      deadline),
+            discard=lambda opened: opened[0].close(),
+            allowed=self.breaker.state == 'closed'
+        )
+
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-
-            return response.choices[0].message.content.strip()
-
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return "I apologize, but I have encountered an error. Please try again later."
\ No newline at end of file
+            if first_delta:
+                yield first_delta
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except (APIError, httpx.TransportError) as e:
+            # Too late to retry, part of the reply may already be shown
+            raise self._stream_failed(feature, e) from e
+        finally:
+            await stream.close()
+
+    async def _open_stream(self, messages: List[Dict[str, str]], temperature: float,
+                           max_tokens: int, priority: int, feature: str,
+                           deadline: Deadline) -> Tuple[AsyncIterator, Optional[str]]:
+        """Open a stream and read up to its first text delta."""
+        stream, _ = await self._create(messages, temperature, max_tokens, priority,
+                                       feature, stream=True, deadline=deadline)
+        try:
+            while True:
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    return stream, None
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, chunk.choices[0].delta.content
+        except (APIError, httpx.TransportError) as e:
+            await stream.close()
+            raise self._stream_failed(feature, e) from e
+        except BaseException:
+            # Lost the race or was cancelled
+            await stream.close()
+            raise
+
+    def _stream_failed(self, feature: str, error: Exception) -> UpstreamError:
+        """Count a failure in the middle of a stream."""
+        self.errors[type(error).__name__] += 1
+        if is_transient(error):
+            self.breaker.failure()
+        return UpstreamError(f"{feature} stream broke off: {error}")
+
+    def stats(self) -> Dict:
+        """Rate limiter, resilience, hedging, request coalescing and response cache statistics."""
+        stats = {**self.rate_limiter.stats(),
+                 'breaker': self.breaker.stats(),
+                 'hedging': self.hedger.stats(),
+                 'errors': dict(self.errors),
+                 'coalesced': dict(self.coalesce_stats)}
+        if self.response_cache:
+            stats['response_cache'] = self.response_cache.stats()
+        return stats
@@ -0,0 +1,183 @@
+"""Local quiz answer checking that avoids an LLM call for obvious cases."""
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Optional
+
+# How many answers were decided locally versus sent to ChatGPT
+validation_stats = Counter()
+
+ARTICLES = {'a', 'an', 'the'}
+
+# Shortest expected answer in which a typo is tolerated
+TYPO_MIN_LENGTH = 6
+
+# Digits written in thousands groups, "1 000 000"
+DIGIT_GROUPS = re.compile(r'(?<!\d)\d{1,3}(?:\s\d{3})+(?!\d)')
+
+UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
+}
+SCALES = {'hundred': 100, 'thousand': 1000, 'million': 1000000, 'billion': 1000000000}
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya'
+}
+
+
+def _words_to_numbers(tokens: List[str]) -> List[str]:
+    """Replace runs of English number words with digits.
+
+    Groups that cannot be added up are read digit-wise, so "nineteen
+    sixty nine" becomes 1969.
+    """
+    result = []
+    groups = ''
+    total = None
+    current = 0
+    previous = None
+
+    def end_group():
+        nonlocal groups, total, current
+        if total is not None:
+            groups += str(total + current)
+        total = None
+        current = 0
+
+    def flush():
+        nonlocal groups, previous
+        end_group()
+        if groups:
+            result.append(groups)
+        groups = ''
+        previous = None
+
+    for token in tokens:
+        if token in UNITS or token in TENS:
+            kind = 'tens' if token in TENS else ('teen' if UNITS[token] >= 10 else 'unit')
+            if (previous in ('unit', 'teen') or
+                    (previous == 'tens' and kind != 'unit')):
+                end_group()
+            if total is None:
+                total = 0
+            current += UNITS.get(token, TENS.get(token, 0))
+            previous = kind
+        elif token in SCALES and total is not None:
+            scale = SCALES[token]
+            if scale == 100:
+                current = max(current, 1) * scale
+            else:
+                total += max(current, 1) * scale
+                current = 0
+            previous = 'scale'
+        elif token == 'and' and total is not None:
+            continue
+        else:
+            flush()
+            result.append(token)
+    flush()
+    return result
+
+
+def normalise_answer(text: str) -> str:
+    """Normalise case, script, punctuation, articles and number words."""
+    text = text.lower().strip()
+    text = ''.join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in text)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[\-–—/]", ' ', text)
+    text = re.sub(r"[^\w\s]", '', text)
+    text = DIGIT_GROUPS.sub(lambda m: re.sub(r'\s', '', m.group()), text)
+    tokens = [t for t in text.split() if t not in ARTICLES]
+    return ' '.join(_words_to_numbers(tokens))
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _is_typo(user: str, expected: str) -> bool:
+    """Whether an answer is the expected one with a single slip of the finger.
+
+    Only one edit inside an answer of at least TYPO_MIN_LENGTH characters
+    counts. An edit to the first or last character is more often a
+    different answer (Gambia for Zambia, Swedes for Sweden) than a typo.
+    """
+    if len(expected) < TYPO_MIN_LENGTH or abs(len(user) - len(expected)) > 1:
+        return False
+    if edit_distance(user, expected) != 1:
+        return False
+    return user[0] == expected[0] and user[-1] == expected[-1]
+
+
+def _expected_variants(expected: str) -> List[str]:
+    """Accepted forms of the expected answer."""
+    raw = [expected, re.sub(r'\(.*?\)', '', expected)]
+    raw += re.split(r'\s+or\s+|/', expected)
+    variants = []
+    for variant in raw:
+        normalised = normalise_answer(variant)
+        if normalised and normalised not in variants:
+            variants.append(normalised)
+    return variants
+
+
+def check_answer(user_answer: str, expected: str) -> Optional[bool]:
+    """Decide obvious answers locally.
+
+    Returns True for an obviously correct answer, False for an obviously
+    wrong one and None when ChatGPT should decide.
+    """
+    user = normalise_answer(user_answer or '')
+    variants = _expected_variants(expected or '')
+    if not variants:
+        return None
+    if not user:
+        return False
+
+    user_numbers = re.findall(r'\d+', user)
+    for variant in variants:
+        if user == variant:
+            return True
+
+        variant_numbers = re.findall(r'\d+', variant)
+        if variant_numbers or user_numbers:
+            # Numbers must match exactly, typos are only tolerated in the words
+            if user_numbers != variant_numbers:
+                continue
+            user_words = re.sub(r'\d+', '', user).split()
+            variant_words = re.sub(r'\d+', '', variant).split()
+            if not user_words or user_words == variant_words:
+                return True
+            continue
+
+        if _is_typo(user, variant):
+            return True
+
+    # A number that matches none of the expected numbers is plainly wrong
+    expected_numbers = [re.findall(r'\d+', v) for v in variants]
+    if user_numbers and all(expected_numbers) and user == ' '.join(user_numbers):
+        return False
+
+    return None
@@ -0,0 +1,88 @@
+"""In-memory store of Telegram-optimised bot images."""
+import hashlib
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+from config import IMAGES, IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images are then sent as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Asset:
+    """Image bytes ready to be uploaded to Telegram."""
+    data: bytes
+    filename: str
+    content_hash: str
+    original_size: int
+
+
+class AssetStore:
+    """Reads bot images once at startup and keeps optimised copies in memory."""
+
+    def __init__(self, images: Dict[str, str] = IMAGES,
+                 max_side: int = IMAGE_MAX_SIDE,
+                 quality: int = IMAGE_JPEG_QUALITY):
+        self.images = images
+        self.max_side = max_side
+        self.quality = quality
+        self._assets: Dict[str, Asset] = {}
+
+    def load(self):
+        """Load and optimise all images. Blocking, run it in a thread."""
+        original_total = 0
+        optimised_total = 0
+
+        for image_key, path in self.images.items():
+            if not os.path.exists(path):
+                logger.warning(f"Image '{image_key}' not found at {path}")
+                continue
+
+            try:
+                with open(path, 'rb') as f:
+                    original = f.read()
+                data, filename = self._optimise(original, path)
+            except Exception as e:
+                logger.error(f"Error loading image '{image_key}': {e}")
+                continue
+
+            self._assets[image_key] = Asset(
+                data=data,
+                filename=filename,
+                content_hash=hashlib.sha256(data).hexdigest(),
+                original_size=len(original)
+            )
+            original_total += len(original)
+            optimised_total += len(data)
+
+        if optimised_total:
+            logger.info(
+                f"Loaded {len(self._assets)} images: {original_total / 1024:.0f} KB -> "
+                f"{optimised_total / 1024:.0f} KB ({original_total / optimised_total:.1f}x smaller)"
+            )
+
+    def _optimise(self, original: bytes, path: str):
+        """Convert an image to a downscaled JPEG."""
+        if Image is None:
+            return original, os.path.basename(path)
+
+        with Image.open(io.BytesIO(original)) as image:
+            image = image.convert('RGB')
+            image.thumbnail((self.max_side, self.max_side))
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=self.quality,
+                       optimize=True, progressive=True)
+
+        filename = os.path.splitext(os.path.basename(path))[0] + '.jpg'
+        return output.getvalue(), filename
+
+    def get(self, image_key: str) -> Optional[Asset]:
+        """Get a loaded image by key."""
+        return self._assets.get(image_key)
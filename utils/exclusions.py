@@ -0,0 +1,64 @@
+"""Deduplicated, relevance-ordered titles to keep out of recommendations."""
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Iterable, List
+
+# Years like "(1999)", "[1999]" or a trailing ", 1999", but not "Blade Runner 2049"
+_YEAR = re.compile(r'\s*[(\[]\s*(?:18|19|20)\d{2}\s*[)\]]|\s*[,\u2013-]\s*(?:18|19|20)\d{2}$')
+_ARTICLE = re.compile(r'^(?:the|an|a) ')
+
+
+def normalise_title(title: str) -> str:
+    """Lowercase a title and drop its year, punctuation and leading article."""
+    title = _YEAR.sub(' ', title.lower().strip())
+    title = re.sub(r'[\W_]+', ' ', title).strip()
+    return _ARTICLE.sub('', title)
+
+
+def title_key(title: str) -> int:
+    """Compact 64-bit key of a normalised title, storable as an SQLite INTEGER."""
+    digest = hashlib.blake2b(normalise_title(title).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class ExclusionList:
+    """Titles indexed by normalised key, in ascending order of relevance.
+
+    Titles added later are more relevant, and adding a title again makes it
+    the most relevant. Variants of a title that only differ in case, year
+    or article are stored once.
+    """
+
+    def __init__(self, titles: Iterable[str] = ()):
+        self._titles: "OrderedDict[int, str]" = OrderedDict()
+        for title in titles:
+            self.add(title)
+
+    @classmethod
+    def for_user(cls, disliked: List[str], shown: List[str]) -> 'ExclusionList':
+        """Build from dislikes and titles shown this session, both oldest first.
+
+        What was just shown in the current genre ranks above older dislikes.
+        """
+        return cls(list(disliked) + list(shown))
+
+    def add(self, title: str) -> bool:
+        """Add a title. Returns False if it, or a variant of it, is already excluded."""
+        key = title_key(title)
+        if key in self._titles:
+            self._titles.move_to_end(key)
+            return False
+        self._titles[key] = title
+        return True
+
+    def __contains__(self, title: str) -> bool:
+        return title_key(title) in self._titles
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def most_relevant(self, limit: int) -> List[str]:
+        """The limit most relevant titles, most relevant first."""
+        titles = list(self._titles.values())
+        return titles[:-limit - 1:-1] if limit > 0 else []
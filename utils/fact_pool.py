@@ -0,0 +1,135 @@
+"""Pool of pre-generated random facts kept topped up in the background."""
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict, deque
+from typing import Optional
+from utils.rate_limiter import PRIORITY_PREFETCH
+from utils.resilience import OpenAIUnavailable
+from utils.prompts import RANDOM_FACT_PROMPT
+from config import FACT_POOL_SIZE, FACT_POOL_DEDUP_SIZE, FACT_POOL_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Consecutive duplicate facts before the refill job takes a break
+MAX_DUPLICATE_STREAK = 3
+
+
+def fact_hash(fact: str) -> str:
+    """Hash of a fact normalised for case, punctuation and whitespace."""
+    normalised = re.sub(r'[\W_]+', ' ', fact.lower()).strip()
+    return hashlib.sha1(normalised.encode('utf-8')).hexdigest()[:16]
+
+
+class FactPool:
+    """Bounded buffer of random facts with a deduplication index."""
+
+    def __init__(self, openai_client, db=None, size: int = FACT_POOL_SIZE,
+                 dedup_size: int = FACT_POOL_DEDUP_SIZE):
+        self.openai_client = openai_client
+        self.db = db
+        self.size = size
+        self.dedup_size = dedup_size
+        self._facts = deque(maxlen=size)
+        self._seen = OrderedDict()
+        self._refill_needed = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Load persisted facts and start the background refill job."""
+        if self.db:
+            for known_hash in reversed(await self.db.get_fact_hashes(self.dedup_size)):
+                self._remember(known_hash)
+            for row in await self.db.get_pooled_facts(self.size):
+                self._facts.append((row['fact_hash'], row['fact']))
+
+        logger.info(f"Fact pool loaded {len(self._facts)} facts")
+        self._refill_needed.set()
+        self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        """Stop the background refill job."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+
+    def _remember(self, known_hash: str) -> bool:
+        """Add a hash to the dedup index. Returns False if it was already there."""
+        if known_hash in self._seen:
+            self._seen.move_to_end(known_hash)
+            return False
+        self._seen[known_hash] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return True
+
+    async def get(self) -> str:
+        """Get a fact from the pool, falling back to a live request if empty.
+
+        Raises OpenAIUnavailable if the pool is empty and the request fails.
+        """
+        self._refill_needed.set()
+
+        if self._facts:
+            known_hash, fact = self._facts.popleft()
+            if self.db:
+                await self.db.mark_fact_served(known_hash, fact)
+            return fact
+
+        logger.info("Fact pool empty, generating fact on demand")
+        fact = await self.openai_client.generate_response(RANDOM_FACT_PROMPT, feature='fact',
+                                                          coalesce=True)
+        known_hash = fact_hash(fact)
+        self._remember(known_hash)
+        if self.db:
+            await self.db.mark_fact_served(known_hash, fact)
+        return fact
+
+    async def _refill_loop(self):
+        """Keep the pool topped up to its target size."""
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+
+            duplicates = 0
+            while len(self._facts) < self.size:
+                try:
+                    added = await self._add_fact()
+                except OpenAIUnavailable as e:
+                    logger.warning(f"Fact pool refill failed: {e}")
+                    await asyncio.sleep(FACT_POOL_RETRY_DELAY)
+                    continue
+                except Exception:
+                    # Keep the job alive, or the pool silently stops refilling
+                    logger.exception("Error refilling the fact pool")
+                    await asyncio.sleep(FACT_POOL_RETRY_DELAY)
+                    continue
+
+                if added:
+                    duplicates = 0
+                    continue
+                duplicates += 1
+                if duplicates >= MAX_DUPLICATE_STREAK:
+                    logger.info("Fact pool refill is getting duplicates, pausing")
+                    await asyncio.sleep(FACT_POOL_RETRY_DELAY)
+                    duplicates = 0
+
+            logger.debug(f"Fact pool topped up to {len(self._facts)} facts")
+
+    async def _add_fact(self) -> bool:
+        """Generate a fact and add it to the pool. Returns False for a duplicate."""
+        fact = await self.openai_client.generate_response(RANDOM_FACT_PROMPT, feature='fact',
+                                                          priority=PRIORITY_PREFETCH)
+        known_hash = fact_hash(fact)
+        if not self._remember(known_hash):
+            return False
+
+        self._facts.append((known_hash, fact))
+        if self.db:
+            await self.db.add_pooled_fact(known_hash, fact)
+        return True
@@ -0,0 +1,172 @@
+"""Hedged requests driven by per-feature latency histograms."""
+import asyncio
+import bisect
+import logging
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+from config import (HEDGE_FEATURES, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY,
+                    HEDGE_BUDGET_RATIO, HEDGE_BUDGET_BURST)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Latency histogram buckets, 50 ms growing by 25% up to about two minutes
+BUCKET_BOUNDS = [0.05 * 1.25 ** i for i in range(36)]
+
+# Samples after which old counts are halved, so the histogram follows upstream changes
+HISTOGRAM_DECAY_SAMPLES = 1000
+
+
+class LatencyHistogram:
+    """Log-bucketed latencies with exponential decay of old samples."""
+
+    def __init__(self):
+        self.counts: List[float] = [0.0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self._since_decay = 0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total += 1
+        self._since_decay += 1
+        if self._since_decay >= HISTOGRAM_DECAY_SAMPLES:
+            self.counts = [count / 2 for count in self.counts]
+            self.total /= 2
+            self._since_decay = 0
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of samples."""
+        target = fraction * self.total
+        seen = 0.0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return BUCKET_BOUNDS[min(i, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+
+class HedgeBudget:
+    """Allows extra requests up to a fraction of the hedgeable requests."""
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+
+    def earn(self):
+        self.credits = min(self.burst, self.credits + self.ratio)
+
+    def spend(self) -> bool:
+        if self.credits < 1:
+            return False
+        self.credits -= 1
+        return True
+
+
+class Hedger:
+    """Sends a duplicate of a slow request and takes whichever finishes first.
+
+    A request is hedged once it has taken longer than the feature's usual
+    latency percentile. The loser is cancelled, and hedges are limited to
+    a fraction of requests so a slow upstream doesn't get twice the load.
+    """
+
+    def __init__(self, features=HEDGE_FEATURES, percentile: float = HEDGE_PERCENTILE,
+                 min_samples: int = HEDGE_MIN_SAMPLES, min_delay: float = HEDGE_MIN_DELAY):
+        self.features = set(features)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = HedgeBudget(HEDGE_BUDGET_RATIO, HEDGE_BUDGET_BURST)
+        self.histograms: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.counters = Counter()
+
+    def delay(self, feature: str) -> Optional[float]:
+        """How long to wait before hedging, None if the feature isn't hedged yet."""
+        histogram = self.histograms[feature]
+        if feature not in self.features or histogram.total < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    async def run(self, feature: str, start: Callable[[], Awaitable[T]],
+                  discard: Optional[Callable[[T], Awaitable]] = None,
+                  allowed: bool = True) -> T:
+        """Await start(), starting it a second time if the first is slow.
+
+        discard releases the result of an attempt that finished but lost.
+        """
+        histogram = self.histograms[feature]
+        delay = self.delay(feature) if allowed else None
+        if feature in self.features:
+            self.budget.earn()
+
+        attempts: List[asyncio.Task] = []
+
+        def launch() -> asyncio.Task:
+            started = time.monotonic()
+            task = asyncio.create_task(start())
+
+            def finished(task: asyncio.Task):
+                elapsed = time.monotonic() - started
+                if task.cancelled():
+                    # A cancelled attempt would have taken at least this long. Only
+                    # slow ones say anything about the tail, and they must not be
+                    # left out or the percentile would drift down. Hedges cancelled
+                    # shortly after launch would pull it down instead.
+                    if elapsed >= histogram.percentile(self.percentile):
+                        histogram.record(elapsed)
+                elif task.exception() is None:
+                    histogram.record(elapsed)
+
+            task.add_done_callback(finished)
+            attempts.append(task)
+            return task
+
+        def release(task: asyncio.Task):
+            if discard and not task.cancelled() and task.exception() is None:
+                asyncio.create_task(discard(task.result()))
+
+        winner = None
+        try:
+            primary = launch()
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    if self.budget.spend():
+                        self.counters['hedged'] += 1
+                        logger.debug(f"Hedging {feature} request after {delay:.2f}s")
+                        launch()
+                    else:
+                        self.counters['over_budget'] += 1
+
+            pending = set(attempts)
+            error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = task.exception()
+            if winner is None:
+                raise error
+
+            if winner is not primary:
+                self.counters['hedge_wins'] += 1
+            return winner.result()
+        finally:
+            for task in attempts:
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(release)
+
+    def stats(self) -> Dict:
+        """Latency percentiles per feature and hedging counts."""
+        latency = {feature: {'samples': round(histogram.total),
+                             'p50_ms': round(histogram.percentile(0.5) * 1000),
+                             'p95_ms': round(histogram.percentile(0.95) * 1000),
+                             'p99_ms': round(histogram.percentile(0.99) * 1000)}
+                   for feature, histogram in self.histograms.items() if histogram.total}
+        return {'latency': latency, **self.counters}
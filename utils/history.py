@@ -0,0 +1,156 @@
+"""Token-budgeted talk history with a rolling summary of older turns."""
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+from telegram.ext import ContextTypes
+from utils.prompts import get_conversation_summary_prompt
+from utils.rate_limiter import estimate_message_tokens
+from utils.resilience import OpenAIUnavailable
+from config import TALK_HISTORY_TOKEN_BUDGET, TALK_SUMMARY_MAX_TOKENS, TALK_HISTORY_LOAD_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Summaries being generated, by user. Kept out of user_data because
+# persistence deep-copies it and tasks can't be copied.
+_summary_tasks: Dict[int, asyncio.Task] = {}
+
+
+def trim_history(history: List[Dict[str, str]],
+                 budget: int = TALK_HISTORY_TOKEN_BUDGET) -> Tuple[List[Dict], List[Dict]]:
+    """Split history into older messages to drop and the newest within budget.
+
+    A user message and the reply to it are kept or dropped together.
+    """
+    start = len(history)
+    used = 0
+    while start > 0:
+        turn_start = start - 2 if start >= 2 and history[start - 2]['role'] == 'user' else start - 1
+        turn_tokens = sum(estimate_message_tokens(m) for m in history[turn_start:start])
+        if used + turn_tokens > budget:
+            break
+        used += turn_tokens
+        start = turn_start
+    return history[:start], history[start:]
+
+
+def build_messages(system_prompt: str, user_data: Dict, user_message: str) -> List[Dict[str, str]]:
+    """Build the prompt from the persona, the summary, recent history and the new message."""
+    messages = [{"role": "system", "content": system_prompt}]
+
+    summary = user_data.get('conversation_summary')
+    if summary:
+        messages.append({"role": "system",
+                         "content": f"Summary of your earlier conversation with the user: {summary}"})
+
+    messages.extend(user_data.get('conversation_history', []))
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def load_history(user_data: Dict, conversation: Dict):
+    """Restore a saved talk into user_data, queueing what no longer fits for summary.
+
+    Unsummarised messages older than the loaded ones are left in the
+    database as a backlog, [after_seq, until_seq], summarised page by page
+    before anything newer.
+    """
+    dropped, kept = trim_history(conversation['messages'])
+    user_data['conversation_history'] = kept
+    user_data['summary_pending'] = dropped
+    user_data['conversation_summary'] = conversation['summary']
+    user_data['conversation_seq'] = conversation['last_seq']
+    if conversation['first_seq'] - 1 > conversation['summarised_seq']:
+        user_data['summary_backlog'] = [conversation['summarised_seq'],
+                                        conversation['first_seq'] - 1]
+    else:
+        user_data.pop('summary_backlog', None)
+
+
+async def add_turn(user_id: int, context: ContextTypes.DEFAULT_TYPE,
+                   user_message: str, response: str):
+    """Append and save a turn, moving messages beyond the token budget to the summary queue."""
+    user_data = context.user_data
+    turn = [{"role": "user", "content": user_message},
+            {"role": "assistant", "content": response}]
+
+    # Only the two new messages are written
+    db = context.bot_data.get('database')
+    first_seq = user_data.get('conversation_seq', 0) + 1
+    await db.append_conversation_messages(user_id, user_data['personality'], first_seq, turn)
+    user_data['conversation_seq'] = first_seq + len(turn) - 1
+
+    dropped, kept = trim_history(user_data.get('conversation_history', []) + turn)
+    user_data['conversation_history'] = kept
+    if dropped:
+        user_data.setdefault('summary_pending', []).extend(dropped)
+
+
+def start_summary(user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Fold the backlog and dropped messages into the rolling summary in the background."""
+    pending = context.user_data.get('summary_pending')
+    backlog = context.user_data.get('summary_backlog')
+    if not (pending or backlog) or user_id in _summary_tasks:
+        return
+
+    user_data = context.user_data
+    openai_client = context.bot_data.get('openai_client')
+    db = context.bot_data.get('database')
+
+    async def fold(messages: List[Dict[str, str]]):
+        """The summary extended with messages, None if ChatGPT is unavailable."""
+        prompt = get_conversation_summary_prompt(user_data.get('conversation_summary'), messages)
+        try:
+            return await openai_client.generate_response(prompt, max_tokens=TALK_SUMMARY_MAX_TOKENS,
+                                                         feature='summary')
+        except OpenAIUnavailable as e:
+            # The messages stay unsummarised and are retried with the next turn
+            logger.warning(f"Summarising history failed for user {user_id}: {e}")
+            return None
+
+    async def summarise():
+        # Older messages that were never loaded come first, a page at a time
+        while backlog and backlog[0] < backlog[1]:
+            page = await db.get_conversation_messages(user_id, user_data['personality'],
+                                                      backlog[0], backlog[1],
+                                                      TALK_HISTORY_LOAD_LIMIT)
+            if not page:
+                break
+            summary = await fold([message for _, message in page])
+            if summary is None or user_data.get('summary_backlog') is not backlog:
+                return
+            user_data['conversation_summary'] = summary
+            backlog[0] = page[-1][0]
+            await db.save_conversation_summary(user_id, user_data['personality'],
+                                               summary, backlog[0])
+            logger.debug(f"Summarised {len(page)} older messages for user {user_id}")
+        if backlog and user_data.get('summary_backlog') is backlog:
+            user_data.pop('summary_backlog')
+
+        if not pending:
+            return
+        batch = list(pending)
+        summary = await fold(batch)
+
+        # Discard the result if the conversation was reset in the meantime
+        if summary is None or user_data.get('summary_pending') is not pending:
+            return
+        user_data['conversation_summary'] = summary
+        del pending[:len(batch)]
+
+        # Everything older than what's still pending or in the history is covered
+        summarised_seq = (user_data['conversation_seq'] - len(pending)
+                          - len(user_data['conversation_history']))
+        await db.save_conversation_summary(user_id, user_data['personality'],
+                                           summary, summarised_seq)
+        logger.debug(f"Summarised {len(batch)} messages for user {user_id}")
+
+    task = asyncio.create_task(summarise())
+    _summary_tasks[user_id] = task
+
+    def forget(finished: asyncio.Task):
+        if _summary_tasks.get(user_id) is finished:
+            del _summary_tasks[user_id]
+        if not finished.cancelled() and finished.exception():
+            logger.error(f"Summarising history failed for user {user_id}: {finished.exception()}")
+
+    task.add_done_callback(forget)
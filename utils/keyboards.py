@@ -42,6 +42,31 @@ def get_quiz_topics_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+def get_quiz_mode_keyboard() -> InlineKeyboardMarkup:
+    """Get keyboard for quiz answer mode selection."""
+    keyboard = [
+        [InlineKeyboardButton("✍️ Type Answers", callback_data="quiz_mode_text")],
+        [InlineKeyboardButton("🔘 Multiple Choice", callback_data="quiz_mode_choice")],
+        [InlineKeyboardButton("🔄 Change Topic", callback_data="quiz_change_topic")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def get_quiz_options_keyboard(options: list, question_seq: int) -> InlineKeyboardMarkup:
+    """Get keyboard with answer options for a multiple-choice question.
+
+    The question's sequence number is part of the callback data, so buttons
+    left on an older question can be told apart.
+    """
+    keyboard = []
+    for i, option in enumerate(options):
+        keyboard.append([InlineKeyboardButton(f"{'ABCD'[i]}) {option}",
+                                              callback_data=f"quiz_option_{question_seq}_{i}")])
+    keyboard.append([InlineKeyboardButton("🔄 Change Topic", callback_data="quiz_change_topic")])
+    keyboard.append([InlineKeyboardButton("🏁 Finish Quiz", callback_data="finish")])
+    return InlineKeyboardMarkup(keyboard)
+
+
 def get_quiz_continue_keyboard() -> InlineKeyboardMarkup:
     """Get keyboard for continuing quiz."""
     keyboard = [
@@ -52,6 +77,17 @@ def get_quiz_continue_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+def get_leaderboard_keyboard() -> InlineKeyboardMarkup:
+    """Get keyboard for switching between leaderboards."""
+    topics = list(QUIZ_TOPICS.items())
+    keyboard = [[InlineKeyboardButton("🏆 All Topics", callback_data="leaderboard_all")]]
+    for i in range(0, len(topics), 2):
+        keyboard.append([InlineKeyboardButton(topic_name, callback_data=f"leaderboard_{topic_id}")
+                         for topic_id, topic_name in topics[i:i + 2]])
+    keyboard.append([InlineKeyboardButton("🏁 Back to Menu", callback_data="finish")])
+    return InlineKeyboardMarkup(keyboard)
+
+
 def get_personalities_keyboard() -> InlineKeyboardMarkup:
     """Get keyboard for personality selection."""
     keyboard = []
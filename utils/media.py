@@ -0,0 +1,56 @@
+"""Telegram media cache for bot images."""
+import logging
+from typing import Dict
+from telegram import Message
+from telegram.error import BadRequest
+from utils.assets import AssetStore
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """Reuse Telegram file_ids of bot images instead of re-uploading them."""
+
+    def __init__(self, db, assets: AssetStore):
+        self.db = db
+        self.assets = assets
+        self._file_ids: Dict[str, str] = {}
+
+    async def load(self):
+        """Load cached file_ids that still match the image contents."""
+        stored = await self.db.get_media_file_ids()
+        for image_key, entry in stored.items():
+            asset = self.assets.get(image_key)
+            if asset and entry['content_hash'] == asset.content_hash:
+                self._file_ids[image_key] = entry['file_id']
+
+        logger.info(f"Media cache loaded {len(self._file_ids)} file_ids")
+
+    def has_image(self, image_key: str) -> bool:
+        """Check whether an image is available for sending."""
+        return self.assets.get(image_key) is not None
+
+    async def reply_photo(self, message: Message, image_key: str, **kwargs) -> Message:
+        """Reply with an image, uploading it only if Telegram doesn't have it yet."""
+        asset = self.assets.get(image_key)
+        file_id = self._file_ids.get(image_key)
+
+        if file_id:
+            try:
+                return await message.reply_photo(photo=file_id, **kwargs)
+            except BadRequest as e:
+                if 'file' not in str(e).lower():
+                    raise
+                logger.warning(f"Cached file_id for '{image_key}' rejected: {e}")
+                self._file_ids.pop(image_key, None)
+                await self.db.delete_media_file_id(image_key)
+
+        sent = await message.reply_photo(photo=asset.data, filename=asset.filename, **kwargs)
+
+        if sent.photo:
+            file_id = sent.photo[-1].file_id
+            self._file_ids[image_key] = file_id
+            await self.db.save_media_file_id(image_key, asset.content_hash, file_id)
+            logger.info(f"Cached file_id for '{image_key}'")
+
+        return sent
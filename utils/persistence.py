@@ -0,0 +1,115 @@
+"""PTB persistence that keeps user, chat and bot data in the bot's SQLite database."""
+import json
+import logging
+import zlib
+from typing import Dict, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from database import Database
+from config import PERSISTENCE_UPDATE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores data as JSON documents, writing only those that changed.
+
+    PTB hands over the data of every user and chat that was touched since
+    the last update. A checksum of what is already stored lets unchanged
+    documents be skipped, and the rest go through the database's
+    write-behind buffer to be written in one transaction.
+    """
+
+    def __init__(self, db: Database, store_data: Optional[PersistenceInput] = None,
+                 update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.db = db
+        self._checksums: Dict[Tuple[str, str], int] = {}
+        self.written = 0
+        self.skipped = 0
+
+    async def _load(self, kind: str) -> Dict[str, object]:
+        """Load all documents of a kind."""
+        await self.db.initialize()
+        documents = {}
+        for key, data in (await self.db.get_persistent_data(kind)).items():
+            self._checksums[(kind, key)] = zlib.crc32(data.encode('utf-8'))
+            documents[key] = json.loads(data)
+        return documents
+
+    async def _save(self, kind: str, key: str, value: object):
+        """Save a document unless it is unchanged since it was last saved."""
+        try:
+            data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Cannot persist {kind} {key}: {e}")
+            return
+
+        checksum = zlib.crc32(data.encode('utf-8'))
+        if self._checksums.get((kind, key)) == checksum:
+            self.skipped += 1
+            return
+        self._checksums[(kind, key)] = checksum
+        self.written += 1
+        await self.db.save_persistent_data(kind, key, data)
+
+    async def _drop(self, kind: str, key: str):
+        """Delete a document."""
+        self._checksums.pop((kind, key), None)
+        await self.db.save_persistent_data(kind, key, None)
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {int(key): data for key, data in (await self._load('user')).items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {int(key): data for key, data in (await self._load('chat')).items()}
+
+    async def get_bot_data(self) -> Dict:
+        return (await self._load('bot')).get('bot', {})
+
+    async def get_callback_data(self) -> None:
+        # Arbitrary callback data is not used by the bot
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        documents = await self._load(f'conversation:{name}')
+        return {tuple(json.loads(key)): state for key, state in documents.items()}
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        await self._save('user', str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        await self._save('chat', str(chat_id), data)
+
+    async def update_bot_data(self, data: Dict) -> None:
+        await self._save('bot', 'bot', data)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        kind = f'conversation:{name}'
+        if new_state is None:
+            await self._drop(kind, json.dumps(key))
+        else:
+            await self._save(kind, json.dumps(key), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._drop('user', str(user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._drop('chat', str(chat_id))
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        # This process is the only writer, in-memory data is always current
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        await self.db.flush()
+        logger.info(f"Persistence wrote {self.written} changed documents, "
+                    f"skipped {self.skipped} unchanged")
@@ -41,6 +41,26 @@ def get_quiz_prompt(topic: str, previous_questions: list = None) -> str:
     Make sure the answer is brief (1-5 words when possible).{excluded}"""
 
 
+# Multiple-choice quiz generation prompt
+def get_quiz_choice_prompt(topic: str, previous_questions: list = None) -> str:
+    """Generate prompt for multiple-choice quiz questions."""
+    excluded = ""
+    if previous_questions:
+        excluded = f"\nDo not repeat these questions: {', '.join(previous_questions)}"
+
+    return f"""Generate a single multiple-choice trivia question about {topic}. 
+    The question should be moderately difficult and have exactly one correct option.
+    Format your response as:
+    Question: [Your question here]
+    A) [Option]
+    B) [Option]
+    C) [Option]
+    D) [Option]
+    Correct: [Letter of the correct option]
+
+    Keep each option brief (1-5 words).{excluded}"""
+
+
 # Quiz validation prompt
 def get_quiz_validation_prompt(question: str, correct_answer: str,
                                user_answer: str) -> str:
@@ -80,7 +100,7 @@ def get_auto_translation_prompt(text: str) -> str:
 
 # Recommendation prompt
 def get_recommendation_prompt(category: str, genre: str,
-                              excluded_items: list = None) -> str:
+                              excluded_items: list = None, count: int = 3) -> str:
     """Generate prompt for recommendations."""
     excluded = ""
     if excluded_items:
@@ -88,7 +108,7 @@ def get_recommendation_prompt(category: str, genre: str,
                     f"\n{', '.join(excluded_items)}\n\nPlease provide completely different recommendations.")
 
     if category == 'movies':
-        return f"""Recommend 3 {genre} movies. For each movie, provide:
+        return f"""Recommend {count} {genre} movies. For each movie, provide:
         - Title (with year)
         - Brief plot summary (2-3 sentences)
         - Why it's worth watching
@@ -96,9 +116,45 @@ def get_recommendation_prompt(category: str, genre: str,
         Format each recommendation clearly with the title in bold.{excluded}"""
 
     else:  # books
-        return f"""Recommend 3 {genre} books. For each book, provide:
+        return f"""Recommend {count} {genre} books. For each book, provide:
         - Title and author
         - Brief summary (2-3 sentences)
         - Why it's worth reading
 
         Format each recommendation clearly with the title in bold.{excluded}"""
+
+
+# Talk history summary prompt
+def get_conversation_summary_prompt(previous_summary: str, messages: list) -> str:
+    """Generate prompt that folds older talk messages into a rolling summary."""
+    earlier = ""
+    if previous_summary:
+        earlier = f"Summary of the conversation so far:\n{previous_summary}\n\n"
+
+    transcript = '\n'.join(f"{m['role'].title()}: {m['content']}" for m in messages)
+
+    return f"""{earlier}Continuation of the conversation:
+    {transcript}
+
+    Write an updated summary of the whole conversation in at most 150 words.
+    Keep names, facts and questions the user may refer back to.
+    Respond with the summary only."""
+
+
+def get_recommendation_pool_prompt(category: str, genre: str, count: int,
+                                   excluded_items: list = None) -> str:
+    """Generate prompt for a batch of recommendation candidates."""
+    excluded = ""
+    if excluded_items:
+        excluded = (f"\n\nDo NOT include any of these items:"
+                    f"\n{', '.join(excluded_items)}")
+
+    item = "movie" if category == 'movies' else "book"
+    title = "Title (with year)" if category == 'movies' else "Title and author"
+    return f"""Recommend {count} different, well-regarded {genre} {item}s, from classics to recent ones.
+    Number them and for each {item} provide:
+    - {title} in bold at the start of the line
+    - Brief summary (1-2 sentences)
+    - Why it's worth {"watching" if category == 'movies' else "reading"} (1 sentence)
+
+    Write nothing before or after the list.{excluded}"""
@@ -0,0 +1,221 @@
+"""Priority scheduling of OpenAI requests within the account's rate limits."""
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STANDARD = 1
+PRIORITY_PREFETCH = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_STANDARD: 'standard',
+    PRIORITY_PREFETCH: 'prefetch'
+}
+
+# How long the dispatcher sleeps at most before re-checking the queue head
+MAX_DISPATCH_SLEEP = 0.5
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """Rough token count of a chat message, about four characters per token."""
+    return len(message.get('content') or '') // 4 + 4
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough prompt token count of a message list."""
+    return sum(estimate_message_tokens(m) for m in messages) + 3
+
+
+def parse_duration(value: Optional[str]) -> float:
+    """Parse durations like '1s', '6m0s' or '20ms' from rate limit headers."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * units[unit]
+               for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to its per-minute capacity."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until the bucket holds the given amount."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: float):
+        """Never believe we have more left than the server says we do."""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """Grants OpenAI requests in priority order within RPM and TPM budgets."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._queue: List[Tuple[int, int, float, asyncio.Future, int]] = []
+        self._order = itertools.count()
+        self._paused_until = 0.0
+        self._arrived = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Metrics per priority class
+        self.granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.throttled = 0
+
+    def _delay(self, tokens: int) -> float:
+        """Seconds until a request of this size may be sent."""
+        return max(self._paused_until - time.monotonic(),
+                   self.requests.wait_time(1),
+                   self.tokens.wait_time(tokens))
+
+    def _grant(self, priority: int, tokens: int, waited: float):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.granted[priority] += 1
+        self.total_wait[priority] += waited
+        self.max_wait[priority] = max(self.max_wait[priority], waited)
+
+    async def acquire(self, priority: int, tokens: int):
+        """Wait until a request of the given priority and token estimate may be sent."""
+        if not self._queue and self._delay(tokens) <= 0:
+            self._grant(priority, tokens, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), time.monotonic(), future, tokens))
+        self._arrived.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled, return the budget
+                self.release(tokens)
+            raise
+
+    def release(self, tokens: int):
+        """Return the budget of a request that was granted but not sent."""
+        self.requests.give_back(1)
+        self.tokens.give_back(tokens)
+
+    def refund(self, tokens: int):
+        """Return estimated tokens that the request did not use."""
+        if tokens > 0:
+            self.tokens.give_back(tokens)
+
+    async def _dispatch(self):
+        """Grant queued requests, highest priority first, as budget allows."""
+        while self._queue:
+            priority, _, enqueued, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            delay = self._delay(tokens)
+            if delay > 0:
+                # Wake early if a new request arrives, it may outrank the head
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(),
+                                           min(delay, MAX_DISPATCH_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            self._grant(priority, tokens, time.monotonic() - enqueued)
+            future.set_result(None)
+
+    def backoff(self, seconds: float):
+        """Hold back all requests for the given number of seconds."""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"OpenAI rate limit hit, pausing requests for {seconds:.1f}s")
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Align the buckets with the remaining budget reported by OpenAI."""
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+        try:
+            if remaining_requests is not None:
+                self.requests.sync(float(remaining_requests))
+            if remaining_tokens is not None:
+                self.tokens.sync(float(remaining_tokens))
+        except ValueError:
+            logger.debug(f"Unexpected rate limit headers: {remaining_requests}, {remaining_tokens}")
+
+    @staticmethod
+    def retry_delay(headers: Mapping[str, str]) -> float:
+        """Seconds to wait after a 429, taken from the response headers."""
+        if headers.get('retry-after-ms'):
+            return parse_duration(headers['retry-after-ms']) / 1000
+        delay = parse_duration(headers.get('retry-after'))
+        if not delay:
+            delay = max(parse_duration(headers.get('x-ratelimit-reset-requests')),
+                        parse_duration(headers.get('x-ratelimit-reset-tokens')))
+        return delay or 1.0
+
+    def stats(self) -> Dict:
+        """Queue depth and wait-time statistics per priority class."""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future, _ in self._queue:
+            if not future.done():
+                depth[PRIORITY_NAMES[priority]] += 1
+
+        waits = {}
+        for priority, name in PRIORITY_NAMES.items():
+            granted = self.granted[priority]
+            waits[name] = {
+                'granted': granted,
+                'avg_wait_ms': round(self.total_wait[priority] / granted * 1000, 2)
+                if granted else 0,
+                'max_wait_ms': round(self.max_wait[priority] * 1000, 2)
+            }
+
+        return {
+            'queue_depth': depth,
+            'waits': waits,
+            'throttled': self.throttled,
+            'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 2)
+        }
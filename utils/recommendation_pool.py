@@ -0,0 +1,229 @@
+"""Shared pools of recommendation candidates per category and genre."""
+import asyncio
+import bisect
+import logging
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from utils.exclusions import ExclusionList, title_key
+from utils.prompts import get_recommendation_pool_prompt
+from utils.rate_limiter import PRIORITY_PREFETCH
+from utils.resilience import OpenAIUnavailable
+from config import (MOVIE_GENRES, BOOK_GENRES, RECOMMENDATION_POOL_BATCH,
+                    RECOMMENDATION_POOL_MAX, RECOMMENDATION_POOL_LOW,
+                    RECOMMENDATION_POOL_MAX_TOKENS, RECOMMENDATION_POOL_RETRY_DELAY)
+
+logger = logging.getLogger(__name__)
+
+# A bold title at the start of a line, optionally numbered or a heading
+TITLE_LINE = re.compile(r'^[ \t]*(?:#{1,6}[ \t]*)?(?:\d+[.)][ \t]*)?\*\*(.+?)\*\*', re.MULTILINE)
+
+# Pool titles the refill prompt asks the model to avoid
+POOL_PROMPT_EXCLUDE = 60
+
+# Every (category, genre) offered on the genre keyboards
+POOL_GENRES = frozenset([('movies', genre.lower()) for genre in MOVIE_GENRES]
+                        + [('books', genre.lower()) for genre in BOOK_GENRES])
+
+
+def clean_title(title: str) -> str:
+    """Strip the year in parentheses from a title."""
+    return re.sub(r'\s*\([0-9]{4}\)\s*', '', title).strip()
+
+
+def split_recommendations(recommendations: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split recommendations text into its intro and a (title, text) pair per item."""
+    matches = [match for match in TITLE_LINE.finditer(recommendations)
+               if len(match.group(1).strip()) > 3
+               and not match.group(1).strip().endswith(':')
+               and not match.group(1).startswith('Recommendations')]
+    if not matches:
+        return recommendations, []
+
+    items = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(recommendations)
+        items.append((clean_title(match.group(1)), recommendations[match.start():end].strip()))
+    return recommendations[:matches[0].start()].strip(), items
+
+
+def renumber(block: str, number: int) -> str:
+    """Give a numbered recommendation its position on the page."""
+    return re.sub(r'^(\s*(?:#{1,6}\s*)?)\d+([.)])', rf'\g<1>{number}\2', block, count=1)
+
+
+class _Candidates:
+    """The candidates of one pool, ordered by id."""
+    __slots__ = ('ids', 'items', 'titles')
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.items: List[Tuple[str, str]] = []
+        self.titles = ExclusionList()
+
+    def append(self, item_id: int, title: str, text: str):
+        self.ids.append(item_id)
+        self.items.append((title, text))
+        self.titles.add(title)
+
+    def drop_oldest(self, count: int):
+        del self.ids[:count]
+        del self.items[:count]
+        self.titles = ExclusionList(title for title, _ in self.items)
+
+
+class RecommendationPool:
+    """Candidates generated in bulk and shared by all users of a genre.
+
+    Pool ids only grow, so a user's progress through a pool is a single
+    cursor: everything above it is unseen. Serving needs no database or
+    OpenAI request; pools that run low for a user are refilled in the
+    background.
+    """
+
+    def __init__(self, openai_client, db=None, batch: int = RECOMMENDATION_POOL_BATCH,
+                 max_size: int = RECOMMENDATION_POOL_MAX):
+        self.openai_client = openai_client
+        self.db = db
+        self.batch = batch
+        self.max_size = max_size
+        self._pools: Dict[Tuple[str, str], _Candidates] = {}
+        self._refill_queue: List[Tuple[str, str]] = []
+        self._refill_needed = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._next_attempt: Dict[Tuple[str, str], float] = {}
+        self.counters = Counter()
+
+    async def start(self):
+        """Load the persisted pools and start the background refill job."""
+        if self.db:
+            for row in await self.db.get_recommendation_pool():
+                pool = self._pools.setdefault((row['category'], row['genre']), _Candidates())
+                pool.append(row['id'], row['title'], row['text'])
+
+        logger.info(f"Recommendation pool loaded {self.size()} candidates "
+                    f"in {len(self._pools)} genres")
+        self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        """Stop the background refill job."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+
+    def size(self) -> int:
+        return sum(len(pool.ids) for pool in self._pools.values())
+
+    def take(self, category: str, genre: str, cursor: int, exclusions: ExclusionList,
+             count: int) -> Tuple[List[Tuple[str, str]], int]:
+        """Take up to count unseen candidates that are not excluded.
+
+        Returns the (title, text) picks and the user's new cursor. Picked
+        titles are added to the exclusions.
+        """
+        pool = self._pools.get((category, genre))
+        picks = []
+        if pool:
+            position = bisect.bisect_right(pool.ids, cursor)
+            while position < len(pool.ids) and len(picks) < count:
+                title, text = pool.items[position]
+                if exclusions.add(title):
+                    picks.append((title, text))
+                cursor = pool.ids[position]
+                position += 1
+            remaining = len(pool.ids) - position
+        else:
+            remaining = 0
+
+        self.counters['served' if len(picks) == count else 'short'] += 1
+        if remaining < RECOMMENDATION_POOL_LOW:
+            self._request_refill(category, genre)
+        return picks, cursor
+
+    def _request_refill(self, category: str, genre: str):
+        key = (category, genre)
+        if key not in POOL_GENRES or key in self._refill_queue or self._next_attempt.get(key, 0) > time.monotonic():
+            return
+        self._refill_queue.append(key)
+        self._refill_needed.set()
+
+    async def _refill_loop(self):
+        """Refill pools that ran low, one at a time."""
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+
+            while self._refill_queue:
+                category, genre = self._refill_queue[0]
+                try:
+                    added = await self.refill(category, genre)
+                except Exception as e:
+                    logger.error(f"Error refilling {category}/{genre} recommendations: {e}")
+                    added = 0
+                if not added:
+                    # Don't keep asking while OpenAI fails or only repeats itself
+                    self._next_attempt[(category, genre)] = (time.monotonic()
+                                                             + RECOMMENDATION_POOL_RETRY_DELAY)
+                self._refill_queue.pop(0)
+
+    async def refill(self, category: str, genre: str) -> int:
+        """Generate a batch of new candidates for a pool. Returns how many were added."""
+        pool = self._pools.setdefault((category, genre), _Candidates())
+        prompt = get_recommendation_pool_prompt(category, genre, self.batch,
+                                                pool.titles.most_relevant(POOL_PROMPT_EXCLUDE))
+        self.counters['refills'] += 1
+        try:
+            response = await self.openai_client.generate_response(
+                prompt, max_tokens=RECOMMENDATION_POOL_MAX_TOKENS, feature='recommend_pool',
+                priority=PRIORITY_PREFETCH
+            )
+        except OpenAIUnavailable as e:
+            logger.warning(f"Refilling {category}/{genre} recommendations failed: {e}")
+            return 0
+
+        _, items = split_recommendations(response)
+        new_items = []
+        seen = ExclusionList()
+        for title, text in items:
+            if title not in pool.titles and seen.add(title):
+                new_items.append((title_key(title), title, text))
+        if not new_items:
+            return 0
+
+        if self.db:
+            ids = await self.db.add_recommendation_pool_items(category, genre, new_items)
+        else:
+            first_id = pool.ids[-1] + 1 if pool.ids else 1
+            ids = range(first_id, first_id + len(new_items))
+        for item_id, (_, title, text) in zip(ids, new_items):
+            pool.append(item_id, title, text)
+        self.counters['candidates'] += len(new_items)
+
+        # Drop the oldest candidates, users past them never see them again anyway
+        excess = len(pool.ids) - self.max_size
+        if excess > 0:
+            if self.db:
+                await self.db.trim_recommendation_pool(category, genre, pool.ids[excess - 1])
+            pool.drop_oldest(excess)
+
+        logger.info(f"Added {len(new_items)} {category}/{genre} candidates to the pool")
+        return len(new_items)
+
+    def stats(self) -> Dict:
+        """Pool sizes and how often pages were served from the pool."""
+        pages = self.counters['served'] + self.counters['short']
+        return {
+            'candidates': self.size(),
+            'genres': len(self._pools),
+            'served_ratio': round(self.counters['served'] / pages, 3) if pages else 0,
+            'served': self.counters['served'],
+            'short': self.counters['short'],
+            'refills': self.counters['refills'],
+            'generated': self.counters['candidates']
+        }
+
@@ -0,0 +1,103 @@
+"""Deadlines, retry backoff and a circuit breaker for OpenAI requests."""
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAIUnavailable(Exception):
+    """No response could be produced. Handlers show user_message instead."""
+    user_message = "I apologize, but I have encountered an error. Please try again later."
+
+
+class DeadlineExceeded(OpenAIUnavailable):
+    """The feature's deadline passed before a response arrived."""
+    user_message = "ChatGPT is taking too long to answer right now. Please try again."
+
+
+class CircuitOpen(OpenAIUnavailable):
+    """Requests are failing fast while the upstream is unhealthy."""
+    user_message = "ChatGPT is having problems at the moment. Please try again in a minute."
+
+
+class UpstreamError(OpenAIUnavailable):
+    """The request failed and retrying did not help or was not possible."""
+
+
+class Deadline:
+    """Point in time by which a request must have completed."""
+    __slots__ = ('expires',)
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Opens after consecutive upstream failures and fails fast until it resets.
+
+    Once reset_timeout has passed, a single probe request is let through
+    (half-open). Its success closes the circuit; a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_until = 0.0
+
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def check(self):
+        """Raise CircuitOpen unless a request may be sent now."""
+        state = self.state
+        if state == 'closed':
+            return
+        now = time.monotonic()
+        if state == 'half-open' and now >= self._probe_until:
+            # Let one probe through, another one only if it never reports back
+            self._probe_until = now + self.reset_timeout
+            return
+        self.rejected += 1
+        retry_in = max(self._opened_at + self.reset_timeout, self._probe_until) - now
+        raise CircuitOpen(f"OpenAI circuit open, retry in {retry_in:.0f}s")
+
+    def success(self):
+        if self._opened_at is not None:
+            logger.info("OpenAI circuit closed")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_until = 0.0
+
+    def failure(self):
+        self._failures += 1
+        if self.state == 'half-open' or (self._opened_at is None
+                                         and self._failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._probe_until = 0.0
+            self.opened += 1
+            logger.warning(f"OpenAI circuit opened after {self._failures} failures, "
+                           f"failing fast for {self.reset_timeout}s")
+
+    def stats(self) -> Dict:
+        return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected}
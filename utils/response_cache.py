@@ -0,0 +1,134 @@
+"""Two-tier cache of OpenAI responses: in-process LRU backed by SQLite."""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+from config import (RESPONSE_CACHE_TTLS, RESPONSE_CACHE_MEMORY_BYTES,
+                    RESPONSE_CACHE_DISK_BYTES, RESPONSE_CACHE_PRUNE_INTERVAL)
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts) -> str:
+    """Stable key for the parameters that determine a response."""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU of responses with per-feature TTLs, persisted to SQLite."""
+
+    def __init__(self, db=None, memory_bytes: int = RESPONSE_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = RESPONSE_CACHE_DISK_BYTES,
+                 ttls: Optional[Dict[str, int]] = None):
+        self.db = db
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttls = ttls or RESPONSE_CACHE_TTLS
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._next_prune = 0.0
+        self._prune_task: Optional[asyncio.Task] = None
+        self.counters = Counter()
+
+    async def get(self, feature: str, key: str) -> Optional[str]:
+        """Get a cached response, from memory first and then from disk."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry:
+            response, expires_at, _ = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return response
+            self._remove(key)
+            self.counters['expired'] += 1
+
+        if self.db:
+            cached = await self.db.get_cached_response(key, now)
+            if cached:
+                response, expires_at = cached
+                self._store(key, response, expires_at)
+                self.counters['disk_hits'] += 1
+                return response
+
+        self.counters['misses'] += 1
+        logger.debug(f"Response cache miss for {feature}")
+        return None
+
+    async def put(self, feature: str, key: str, response: str):
+        """Cache a response for its feature's TTL."""
+        ttl = self.ttls.get(feature)
+        if not ttl:
+            return
+
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        self._store(key, response, now + ttl)
+        if self.db:
+            await self.db.save_cached_response(key, feature, response, size, now + ttl, now)
+            self._schedule_prune(now)
+
+    def _store(self, key: str, response: str, expires_at: float):
+        """Add an entry to the in-memory tier, evicting the least recently used."""
+        size = len(response.encode('utf-8'))
+        if size > self.memory_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (response, expires_at, size)
+        self._bytes += size
+
+        while self._bytes > self.memory_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters['evictions'] += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _schedule_prune(self, now: float):
+        """Prune the disk tier in the background at most every prune interval."""
+        if now < self._next_prune or (self._prune_task and not self._prune_task.done()):
+            return
+        self._next_prune = now + RESPONSE_CACHE_PRUNE_INTERVAL
+        self._prune_task = asyncio.create_task(self.prune())
+
+    async def prune(self):
+        """Drop expired and over-budget responses from the disk tier."""
+        if not self.db:
+            return
+        try:
+            expired, evicted = await self.db.prune_response_cache(self.disk_bytes, time.time())
+        except Exception as e:
+            logger.error(f"Error pruning response cache: {e}")
+            return
+        self.counters['disk_expired'] += expired
+        self.counters['disk_evictions'] += evicted
+        if expired or evicted:
+            logger.info(f"Response cache pruned {expired} expired and {evicted} evicted rows")
+
+    async def stop(self):
+        """Wait for a running prune to finish."""
+        if self._prune_task:
+            await self._prune_task
+            self._prune_task = None
+
+    def stats(self) -> Dict:
+        """Hit ratio, bytes held and eviction counts."""
+        hits = self.counters['memory_hits'] + self.counters['disk_hits']
+        lookups = hits + self.counters['misses']
+        return {
+            'hit_ratio': round(hits / lookups, 3) if lookups else 0,
+            'memory_hits': self.counters['memory_hits'],
+            'disk_hits': self.counters['disk_hits'],
+            'misses': self.counters['misses'],
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'evictions': self.counters['evictions'],
+            'expired': self.counters['expired'],
+            'disk_evictions': self.counters['disk_evictions'],
+            'disk_expired': self.counters['disk_expired']
+        }
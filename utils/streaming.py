@@ -0,0 +1,101 @@
+"""Render streamed ChatGPT replies into a Telegram message."""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+from telegram import InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter
+from utils.resilience import OpenAIUnavailable
+from config import STREAM_EDIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Telegram message length limit
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split text into chunks that fit into a Telegram message."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    chunks.append(text)
+    return chunks
+
+
+async def _edit(message: Message, text: str,
+                reply_markup: Optional[InlineKeyboardMarkup] = None) -> float:
+    """Edit message text, returning how long Telegram asks us to back off."""
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except RetryAfter as e:
+        return float(e.retry_after)
+    except BadRequest as e:
+        if 'not modified' not in str(e).lower():
+            raise
+    return 0.0
+
+
+async def stream_reply(message: Message, deltas: AsyncIterator[str],
+                       reply_markup: Optional[InlineKeyboardMarkup] = None,
+                       placeholder: str = "💭 ...",
+                       edit_interval: float = STREAM_EDIT_INTERVAL) -> str:
+    """Reply with a placeholder and update it in place as text deltas arrive.
+
+    Edits are throttled to one per edit_interval seconds to stay within
+    Telegram's edit rate limits. Returns the full reply text. If the stream
+    fails, the error is shown after whatever arrived and then re-raised.
+    """
+    started = time.monotonic()
+    sent = await message.reply_text(placeholder)
+
+    text = ""
+    shown = ""
+    next_edit = 0.0
+    first_visible = None
+
+    error = None
+    try:
+        async for delta in deltas:
+            text += delta
+            now = time.monotonic()
+            if now < next_edit or not text.strip():
+                continue
+
+            preview = split_message(text)[0]
+            if preview.strip() == shown:
+                continue
+            backoff = await _edit(sent, preview + " ▌")
+            shown = preview.strip()
+            next_edit = time.monotonic() + max(edit_interval, backoff)
+
+            if first_visible is None:
+                first_visible = time.monotonic() - started
+                logger.info(f"Time to first visible token: {first_visible * 1000:.0f} ms")
+    except OpenAIUnavailable as e:
+        logger.error(f"Streaming reply failed: {e}")
+        error = e
+
+    text = text.strip()
+    final = text
+    if error:
+        final = f"{text}\n\n⚠️ {error.user_message}" if text else error.user_message
+    chunks = split_message(final) if final else [placeholder]
+
+    # Final edit with the keyboard attached to the last message
+    backoff = await _edit(sent, chunks[0], reply_markup if len(chunks) == 1 else None)
+    if backoff:
+        await asyncio.sleep(backoff)
+        await _edit(sent, chunks[0], reply_markup if len(chunks) == 1 else None)
+
+    for i, chunk in enumerate(chunks[1:], start=2):
+        await message.reply_text(chunk, reply_markup=reply_markup if i == len(chunks) else None)
+
+    if error:
+        raise error
+    logger.debug(f"Streamed reply of {len(text)} chars in {time.monotonic() - started:.2f}s")
+    return text
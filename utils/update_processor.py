@@ -0,0 +1,51 @@
+"""Concurrent update processing that keeps each chat's updates in order."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# PTB holds its own semaphore while an update waits for its chat. We keep
+# that one effectively unbounded and apply the real cap only after the chat
+# lock is taken, so one busy chat can't occupy every processing slot.
+_UNBOUNDED = 2 ** 16
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different chats concurrently, one chat at a time."""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(_UNBOUNDED)
+        self.concurrency_limit = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_users: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Wait for earlier updates of the same chat, then for a free slot."""
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        lock = self._chat_locks.setdefault(chat.id, asyncio.Lock())
+        self._chat_users[chat.id] = self._chat_users.get(chat.id, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            self._chat_users[chat.id] -= 1
+            if not self._chat_users[chat.id]:
+                # Nobody else is waiting on this chat, forget its lock
+                del self._chat_users[chat.id]
+                del self._chat_locks[chat.id]
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to clean up."""
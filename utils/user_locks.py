@@ -0,0 +1,117 @@
+"""Per-user locks that serialize handlers touching the same user_data."""
+import asyncio
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+from config import USER_LOCK_SHARDS, USER_LOCK_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class _LockEntry:
+    """A user's lock with bookkeeping for eviction."""
+    __slots__ = ('lock', 'holders', 'last_used')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.holders = 0
+        self.last_used = time.monotonic()
+
+
+class UserLocks:
+    """Sharded per-user asyncio locks with wait-time metrics and idle eviction.
+
+    Idle locks are evicted incrementally, one shard at a time, so no sweep
+    has to walk every user at once.
+    """
+
+    def __init__(self, shards: int = USER_LOCK_SHARDS,
+                 idle_timeout: float = USER_LOCK_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._shards: List[Dict[int, _LockEntry]] = [{} for _ in range(shards)]
+        self._next_shard = 0
+        self._next_sweep = time.monotonic() + idle_timeout / shards
+
+        # Metrics
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.evicted = 0
+
+    @asynccontextmanager
+    async def hold(self, user_id: int):
+        """Hold the lock of a user for the duration of the block."""
+        shard = self._shards[user_id % len(self._shards)]
+        entry = shard.get(user_id)
+        if entry is None:
+            entry = shard[user_id] = _LockEntry()
+
+        entry.holders += 1
+        started = time.monotonic()
+        if entry.lock.locked():
+            self.contended += 1
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            entry.holders -= 1
+            raise
+
+        waited = time.monotonic() - started
+        self.acquisitions += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logger.warning(f"User {user_id} waited {waited:.1f}s for their lock")
+
+        try:
+            yield
+        finally:
+            entry.lock.release()
+            entry.holders -= 1
+            entry.last_used = time.monotonic()
+            self._evict_idle()
+
+    def _evict_idle(self):
+        """Drop unused locks from the next shard when its sweep is due."""
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.idle_timeout / len(self._shards)
+
+        shard = self._shards[self._next_shard]
+        self._next_shard = (self._next_shard + 1) % len(self._shards)
+        idle = [user_id for user_id, entry in shard.items()
+                if not entry.holders and now - entry.last_used > self.idle_timeout]
+        for user_id in idle:
+            del shard[user_id]
+        self.evicted += len(idle)
+
+    def stats(self) -> Dict:
+        """Lock usage and wait-time statistics."""
+        return {
+            'locks': sum(len(shard) for shard in self._shards),
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'avg_wait_ms': round(self.total_wait / self.acquisitions * 1000, 2)
+            if self.acquisitions else 0,
+            'max_wait_ms': round(self.max_wait * 1000, 2),
+            'evicted': self.evicted
+        }
+
+
+def serialized_per_user(handler):
+    """Run a handler while holding the lock of the user who sent the update."""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        user_locks = context.bot_data.get('user_locks')
+        user = update.effective_user
+        if user_locks is None or user is None:
+            return await handler(update, context)
+
+        async with user_locks.hold(user.id):
+            return await handler(update, context)
+
+    return wrapper